@@ -0,0 +1,93 @@
+import hashlib
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+
+def generate_ics(events: int, phase: int, start: datetime, seed: int = 0):
+    """Generates a synthetic calendar of weekday lectures, with some overlap and some blacklisted practica."""
+    rng = random.Random(seed * 1000 + phase)
+
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//medicus//benchmark//NL"]
+    slot = start.replace(hour=7, minute=0, second=0, microsecond=0)
+
+    for i in range(events):
+        # four slots a day, weekends are skipped
+        slot += timedelta(hours=rng.choice((2, 2, 2, 3)))
+        if slot.hour >= 18:
+            slot = (slot + timedelta(days=1)).replace(hour=7)
+        while slot.weekday() >= 5:
+            slot += timedelta(days=1)
+
+        begin = slot - timedelta(minutes=rng.choice((0, 0, 0, 30)))
+        end = begin + timedelta(minutes=rng.choice((60, 120, 120, 180)))
+        name = "E0I66a Dissectie" if rng.random() < 0.05 else f"E0X{i % 97:03d}a Vak {i % 97}"
+
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:phase{phase}-{i}@benchmark",
+            "DTSTAMP:20240101T000000Z",
+            f"DTSTART:{begin.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%SZ')}",
+            f"SUMMARY:{name}",
+            f"LOCATION:Auditorium {i % 12}",
+            f"DESCRIPTION:Synthetisch hoorcollege {i}",
+            "END:VEVENT",
+        ]
+
+    lines.append("END:VCALENDAR")
+
+    return "\r\n".join(lines) + "\r\n"
+
+
+def calendar_start(events: int):
+    """Starts every calendar so that "now" falls roughly in its middle."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # a weekday holds about 4 events
+    return today - timedelta(days=int(events / 4 * 7 / 5 / 2))
+
+
+class CalendarServer:
+    """Local HTTP server serving ICS files with ETag support, like the university host does."""
+
+    def __init__(self):
+        self.calendars = {}
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    def add(self, name: str, content: str):
+        self.calendars[name] = (content.encode('utf-8'), f'"{hashlib.sha1(content.encode("utf-8")).hexdigest()}"')
+
+        return f"http://127.0.0.1:{self.port}/{name}"
+
+    async def handle(self, request: web.Request):
+        self.requests += 1
+
+        if request.match_info["name"] not in self.calendars:
+            raise web.HTTPNotFound()
+
+        body, etag = self.calendars[request.match_info["name"]]
+
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return web.Response(body=body, content_type="text/calendar", headers={"ETag": etag})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{name}", self.handle)
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.SockSite(self.runner, sock).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
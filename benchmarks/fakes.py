@@ -0,0 +1,74 @@
+import asyncio
+
+
+# in-process stand-ins for the parts of discord.py the schedule module touches, so benchmarks run offline
+
+class FakeMessage:
+
+    def __init__(self, channel, message_id: int, latency: float = 0):
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.latency = latency
+        self.embed = None
+        self.edits = 0
+
+    async def edit(self, embed=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        self.embed = embed
+        self.edits += 1
+
+
+class FakeChannel:
+
+    def __init__(self, guild, channel_id: int, latency: float = 0):
+        self.id = channel_id
+        self.guild = guild
+        self.latency = latency
+        self.messages = {}
+        self.sent = []
+
+    async def send(self, embed=None, **kwargs):
+        self.sent.append(embed)
+
+    def get_partial_message(self, message_id: int):
+        if message_id not in self.messages:
+            self.messages[message_id] = FakeMessage(self, message_id, self.latency)
+
+        return self.messages[message_id]
+
+
+class FakeGuild:
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.channels = {}
+
+    def add_channel(self, channel_id: int, latency: float = 0):
+        self.channels[channel_id] = FakeChannel(self, channel_id, latency)
+        return self.channels[channel_id]
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+class FakeBot:
+
+    def __init__(self, guilds):
+        self.guilds = guilds
+        self.tree = None
+
+    def get_guild(self, guild_id: int):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    async def wait_until_ready(self):
+        pass
+
+    def dispatch(self, event, *args, **kwargs):
+        pass
+
+    def edits(self):
+        return sum(message.edits for guild in self.guilds for channel in guild.channels.values()
+                   for message in channel.messages.values())
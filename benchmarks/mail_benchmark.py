@@ -0,0 +1,66 @@
+"""
+Benchmarks the verification mail outbox against a local Mailgun stand-in.
+
+Run from the repository root:
+
+    python -m benchmarks.mail_benchmark --mails 500 --latency 0.2 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+import aiosqlite
+
+import db.schema
+from benchmarks.mailgun import MailgunServer
+from verification.mail_outbox import MailOutbox, MailTemplate
+
+
+async def main(args):
+    server = MailgunServer(args.latency, args.failure_rate, args.seed)
+    await server.start()
+
+    workdir = tempfile.TemporaryDirectory()
+    con = await aiosqlite.connect(os.path.join(workdir.name, "bench.db"))
+    con.row_factory = sqlite3.Row
+    await db.schema.create_schema(con)
+
+    outbox = MailOutbox(con, server.url, "key", "gnkdiscord.be", "medicus@gnkdiscord.be",
+                        MailTemplate("assets/email.html"), workers=args.workers, retry_delay=args.retry_delay)
+    await outbox.open()
+
+    try:
+        # what a code request waits for, the delivery itself happens in the background
+        started = time.perf_counter()
+        for i in range(args.mails):
+            await outbox.enqueue(f"student{i}@student.kuleuven.be", 10000 + i)
+        enqueued = time.perf_counter() - started
+
+        await outbox.queue.join()
+        drained = time.perf_counter() - started
+
+        async with con.execute('SELECT `status`, COUNT(*) AS `count` FROM mail_outbox GROUP BY `status`') as cursor:
+            statuses = {row["status"]: row["count"] for row in await cursor.fetchall()}
+    finally:
+        await outbox.close()
+        await server.stop()
+        await con.close()
+        workdir.cleanup()
+
+    print(f"{args.mails} mails enqueued in {enqueued:.3f}s ({enqueued / args.mails * 1e3:.2f}ms per request)")
+    print(f"Delivered in {drained:.2f}s with {server.requests} API requests: {statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the mail outbox")
+    parser.add_argument("--mails", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated latency of the API, in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="fraction of requests answered with a 503")
+    parser.add_argument("--retry-delay", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+import asyncio
+import random
+import socket
+
+from aiohttp import web
+
+
+class MailgunServer:
+    """Local stand-in for the Mailgun messages API, with simulated latency and transient failures."""
+
+    def __init__(self, latency: float = 0, failure_rate: float = 0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.delivered = []
+        self.runner = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def handle(self, request: web.Request):
+        self.requests += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.rng.random() < self.failure_rate:
+            raise web.HTTPServiceUnavailable()
+
+        form = await request.post()
+        self.delivered.append((request.match_info["domain"], form["to"]))
+
+        return web.json_response({"id": f"<{self.requests}@{request.match_info['domain']}>", "message": "Queued. Thank you."})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v3/{domain}/messages", self.handle)
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.SockSite(self.runner, sock).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
@@ -0,0 +1,227 @@
+"""
+Benchmarks the schedule path against synthetic calendars, a local ICS server and fake Discord objects.
+
+Run from the repository root:
+
+    python -m benchmarks.schedule_benchmark --events 1000 10000 --output bench.json --baseline previous.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import aiosqlite
+from arrow import Arrow
+
+import db.schema
+from benchmarks.calendars import CalendarServer, calendar_start, generate_ics
+from benchmarks.fakes import FakeBot, FakeGuild
+from schedule.calendar_index import CalendarIndex
+from schedule.schedule import ScheduleModule, create_parse_executor
+
+
+class Measurement:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0
+        self.peak_bytes = 0
+        self.samples = []
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def to_dict(self):
+        result = {"seconds": self.seconds, "peak_bytes": self.peak_bytes}
+
+        if self.samples:
+            samples = sorted(self.samples)
+            result.update({
+                "calls": len(samples),
+                "mean_us": statistics.fmean(samples) * 1e6,
+                "p50_us": samples[len(samples) // 2] * 1e6,
+                "p95_us": samples[int(len(samples) * 0.95)] * 1e6,
+            })
+
+        return result
+
+
+async def run_update_pass(cog: ScheduleModule):
+    return await cog.update_phases(cog.transitions.pop_due(float("inf")))
+
+
+async def benchmark_size(server: CalendarServer, events: int, phases: int, messages: int, lookups: int,
+                         latency: float, seed: int):
+    results = {}
+    rng = random.Random(seed)
+    workdir = tempfile.TemporaryDirectory()
+
+    con = await aiosqlite.connect(os.path.join(workdir.name, "bench.db"))
+    con.row_factory = sqlite3.Row
+    await db.schema.create_schema(con)
+
+    guilds = [FakeGuild(guild_id) for guild_id in range(1, 4)]
+    bot = FakeBot(guilds)
+
+    cog = ScheduleModule(bot, con)
+    cog.ics_cache.cache_dir = os.path.join(workdir.name, "ics")
+    cog.ics_cache.ttl = 0
+    cog.parse_executor = create_parse_executor()
+    await cog.ics_cache.open()
+
+    start = calendar_start(events)
+    for phase in range(1, phases + 1):
+        content = generate_ics(events, phase, start, seed)
+        url = server.add(f"phase{phase}-{events}.ics", content)
+        await cog.register_calendar(url, phase)
+
+        with Measurement(f"parse_phase_{phase}") as measurement:
+            CalendarIndex.from_ics(content, cog.schedule_filter.current)
+        results.setdefault("ics_parse", []).append(measurement.seconds)
+
+    # messages are spread over guilds and channels, every phase gets its share
+    for i in range(messages):
+        guild = guilds[i % len(guilds)]
+        channel = guild.get_channel(i) or guild.add_channel(i, latency)
+        await con.execute(
+            'INSERT INTO subscribed_messages (`phase`, `channel_id`, `message_id`, `guild_id`) values (?, ?, ?, ?)',
+            (i % phases + 1, channel.id, 10_000 + i, guild.id))
+    await con.commit()
+    await cog.load_messages()
+
+    requests_before = server.requests
+    with Measurement("check_ical_cold") as measurement:
+        await cog.check_ical()
+        stats = await run_update_pass(cog)
+    results["check_ical_cold"] = measurement.to_dict()
+    results["check_ical_cold"]["fanout_seconds"] = stats.duration if stats else 0
+    results["check_ical_cold"]["peak_queue_depth"] = stats.peak_queue_depth if stats else 0
+    results["check_ical_cold"].update({"edits": bot.edits(), "requests": server.requests - requests_before})
+
+    edits_before, requests_before = bot.edits(), server.requests
+    with Measurement("check_ical_warm") as measurement:
+        await cog.check_ical()
+        stats = await run_update_pass(cog)
+    results["check_ical_warm"] = measurement.to_dict()
+    results["check_ical_warm"]["fanout_seconds"] = stats.duration if stats else 0
+    results["check_ical_warm"]["peak_queue_depth"] = stats.peak_queue_depth if stats else 0
+    results["check_ical_warm"].update({"edits": bot.edits() - edits_before, "requests": server.requests - requests_before})
+
+    now = Arrow.now().timestamp()
+    with Measurement("get_event_at") as measurement:
+        for _ in range(lookups):
+            time_at = Arrow.fromtimestamp(now + rng.uniform(-30, 30) * 86400)
+            phase = rng.randint(1, phases)
+
+            started = time.perf_counter()
+            await cog.get_event_at(time_at, phase)
+            measurement.samples.append(time.perf_counter() - started)
+    results["get_event_at"] = measurement.to_dict()
+
+    subscription = next(iter(cog.messages.values()))
+    embeds = []
+    for offset in (0, 7):
+        course_event = await cog.get_event_at(Arrow.fromtimestamp(now + offset * 86400), subscription.phase)
+        embeds.append(cog.build_embed(course_event))
+
+    for name, changing in (("update_embed_changed", True), ("update_embed_unchanged", False)):
+        with Measurement(name) as measurement:
+            for i in range(lookups):
+                embed = embeds[i % 2] if changing else embeds[0]
+
+                started = time.perf_counter()
+                await cog.update_embed(subscription, embed)
+                measurement.samples.append(time.perf_counter() - started)
+        results[name] = measurement.to_dict()
+
+    await cog.ics_cache.close()
+    cog.parse_executor.shutdown()
+    await con.close()
+    workdir.cleanup()
+
+    parse_times = results.pop("ics_parse")
+    results["ics_parse"] = {"seconds": statistics.fmean(parse_times), "phases": len(parse_times)}
+
+    return results
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path) as file:
+        baseline = {(run["events"], run["phases"], run["messages"]): run["metrics"] for run in json.load(file)["runs"]}
+
+    for run in results["runs"]:
+        previous = baseline.get((run["events"], run["phases"], run["messages"]))
+        if previous is None:
+            continue
+
+        for name, metric in run["metrics"].items():
+            if name in previous and previous[name]["seconds"]:
+                change = metric["seconds"] / previous[name]["seconds"] - 1
+                print(f"{run['events']:>7} events  {name:<24} {metric['seconds']:10.4f}s  {change:+8.1%}")
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    server = CalendarServer()
+    await server.start()
+
+    results = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "runs": []
+    }
+
+    try:
+        for events in args.events:
+            metrics = await benchmark_size(server, events, args.phases, args.messages, args.lookups, args.latency,
+                                           args.seed)
+            results["runs"].append({"events": events, "phases": args.phases, "messages": args.messages,
+                                    "metrics": metrics})
+
+            for name, metric in metrics.items():
+                print(f"{events:>7} events  {name:<24} {metric['seconds']:10.4f}s")
+    finally:
+        await server.stop()
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the schedule module")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000],
+                        help="calendar sizes to benchmark, in events per phase")
+    parser.add_argument("--phases", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=90, help="subscribed messages, spread over all phases")
+    parser.add_argument("--lookups", type=int, default=1000, help="calls per micro benchmark")
+    parser.add_argument("--latency", type=float, default=0, help="simulated latency of a message edit, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="earlier output to compare against")
+
+    asyncio.run(main(parser.parse_args()))
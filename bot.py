@@ -9,7 +9,9 @@ from discord.ext import commands
 from dotenv import load_dotenv
 
 import db.connection_manager
+import db.schema
 from misc import misc
+from schedule.reminders import ReminderModule
 from schedule.schedule import ScheduleModule
 from verification.verification import VerificationModule
 
@@ -38,6 +40,7 @@ async def setup_hook():
 async def on_ready():
     await client.add_cog(VerificationModule(client, client.con))
     await client.add_cog(ScheduleModule(client, client.con))
+    await client.add_cog(ReminderModule(client, client.con))
     await client.add_cog(misc.MiscModule(client))
 
     await tree.sync()
@@ -60,39 +63,7 @@ async def ping(interaction: discord.Interaction):
 async def initialise_db():
     con = await aiosqlite.connect("bot.db")
     con.row_factory = sqlite3.Row  # https://stackoverflow.com/questions/3300464/how-can-i-get-dict-from-sqlite-query
-    cur = await con.cursor()
-
-    await cur.execute(
-        'CREATE TABLE IF NOT EXISTS subscribed_messages (id INTEGER PRIMARY KEY, channel_id INTEGER, message_id INTEGER, '
-        'guild_id INTEGER, phase INTEGER);')
-
-    await cur.execute(
-        'CREATE TABLE IF NOT EXISTS calendars (id INTEGER PRIMARY KEY, link TEXT, phase INTEGER UNIQUE);')
-
-    await cur.execute(
-        'CREATE TABLE IF NOT EXISTS verification_codes (id INTEGER PRIMARY KEY, code INTEGER, email VARCHAR(255) UNIQUE)'
-    )
-
-    await cur.execute(
-        'CREATE TABLE IF NOT EXISTS verified_users (id INTEGER PRIMARY KEY, user_id INTEGER UNIQUE, email VARCHAR(255) UNIQUE)'
-    )
-
-    await cur.execute(
-        'CREATE TABLE IF NOT EXISTS synced_verification_messages (id INTEGER PRIMARY KEY, guild_id INTEGER, channel_id '
-        'INTEGER, message_id INTEGER)'
-    )
-
-    try:
-        await cur.execute(
-            'ALTER TABLE verification_codes ADD COLUMN generated_at TIMESTAMP')
-
-        await cur.execute(
-            "UPDATE verification_codes SET generated_at = datetime('now') WHERE generated_at IS NULL;")
-    except Exception as e:
-        print(e)
-
-
-    await con.commit()
+    await db.schema.create_schema(con)
 
     cm = db.connection_manager.ConnectionManager(con)
     await cm.initialize_cursor()
@@ -100,5 +71,6 @@ async def initialise_db():
     return con
 
 
-client.run(os.getenv("TOKEN"))
-
+# the calendar parser processes import this module again, they must not start a bot of their own
+if __name__ == "__main__":
+    client.run(os.getenv("TOKEN"))
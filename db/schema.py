@@ -0,0 +1,97 @@
+import aiosqlite
+
+
+async def create_schema(con: aiosqlite.Connection):
+    cur = await con.cursor()
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS subscribed_messages (id INTEGER PRIMARY KEY, channel_id INTEGER, message_id INTEGER, '
+        'guild_id INTEGER, phase INTEGER);')
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS calendar_feeds (id INTEGER PRIMARY KEY, phase INTEGER, link TEXT, digest TEXT, '
+        'refreshed_at REAL, UNIQUE(phase, link));')
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS feed_events (id INTEGER PRIMARY KEY, feed INTEGER, uid TEXT, name TEXT, '
+        'location TEXT, description TEXT, begin_at REAL, end_at REAL, recurring INTEGER DEFAULT 0, content_hash TEXT, '
+        'UNIQUE(feed, uid));')
+
+    await cur.execute('CREATE INDEX IF NOT EXISTS feed_events_feed_begin ON feed_events (feed, begin_at);')
+
+    await cur.execute('CREATE INDEX IF NOT EXISTS feed_events_name_begin ON feed_events (name, begin_at);')
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS lecture_reminders (id INTEGER PRIMARY KEY, user_id INTEGER, phase INTEGER, '
+        'minutes INTEGER, UNIQUE(user_id, phase));')
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS verification_codes (id INTEGER PRIMARY KEY, code INTEGER, email VARCHAR(255) UNIQUE)'
+    )
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS verified_users (id INTEGER PRIMARY KEY, user_id INTEGER UNIQUE, email VARCHAR(255) UNIQUE)'
+    )
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS mail_outbox (id INTEGER PRIMARY KEY, email VARCHAR(255), code INTEGER, status TEXT, '
+        'attempts INTEGER, last_error TEXT, message_id TEXT, created_at REAL, updated_at REAL)'
+    )
+
+    await cur.execute('CREATE INDEX IF NOT EXISTS mail_outbox_status ON mail_outbox (status, created_at);')
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS alumni_jobs (id INTEGER PRIMARY KEY, guild_id INTEGER, channel_id INTEGER, '
+        'status TEXT, created_at REAL, updated_at REAL)'
+    )
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS alumni_job_entries (id INTEGER PRIMARY KEY, job_id INTEGER, user_id INTEGER, '
+        'email VARCHAR(255), outcome TEXT, new_email VARCHAR(255), state TEXT, error TEXT, UNIQUE(job_id, user_id))'
+    )
+
+    await cur.execute(
+        'CREATE TABLE IF NOT EXISTS synced_verification_messages (id INTEGER PRIMARY KEY, guild_id INTEGER, channel_id '
+        'INTEGER, message_id INTEGER)'
+    )
+
+    try:
+        await cur.execute(
+            'ALTER TABLE verification_codes ADD COLUMN generated_at TIMESTAMP')
+
+        await cur.execute(
+            "UPDATE verification_codes SET generated_at = datetime('now') WHERE generated_at IS NULL;")
+    except Exception as e:
+        print(e)
+
+    # the migrations below only run on databases which still need them, instead of failing on every start
+    if not await column_exists(cur, 'subscribed_messages', 'fingerprint'):
+        await cur.execute(
+            'ALTER TABLE subscribed_messages ADD COLUMN fingerprint TEXT')
+
+    # a phase used to have a single calendar, those become the first feed of their phase. Their events are parsed
+    # again, as stored events now belong to a feed instead of a phase.
+    if await table_exists(cur, 'calendars'):
+        await cur.execute(
+            'INSERT OR IGNORE INTO calendar_feeds (`phase`, `link`) SELECT `phase`, `link` FROM calendars')
+
+        await cur.execute('DROP TABLE calendars')
+        await cur.execute('DROP TABLE IF EXISTS events')
+
+    if not await column_exists(cur, 'feed_events', 'content_hash'):
+        await cur.execute(
+            'ALTER TABLE feed_events ADD COLUMN content_hash TEXT')
+
+    await con.commit()
+
+
+async def table_exists(cur: aiosqlite.Cursor, table: str):
+    await cur.execute("SELECT 1 FROM sqlite_master WHERE `type` = 'table' AND `name` = ?", (table,))
+
+    return await cur.fetchone() is not None
+
+
+async def column_exists(cur: aiosqlite.Cursor, table: str, column: str):
+    await cur.execute(f'PRAGMA table_info(`{table}`)')
+
+    return any(row[1] == column for row in await cur.fetchall())
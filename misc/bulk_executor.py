@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+import discord
+
+from misc.rate_limiter import RateLimiter
+
+
+class BulkExecutor:
+    """
+    Runs a Discord action over many items with bounded concurrency and a shared rate limit.
+
+    Rate limited (429) and server side (5xx) errors are retried with exponential backoff. Any other error fails only
+    the item it happened on and is handed to `on_failure`.
+    """
+
+    def __init__(self, concurrency: int = 4, rate: float = 2, retries: int = 3, retry_delay: float = 5):
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    async def run(self, items, action, on_failure=None, on_progress=None):
+        """
+        Returns the number of items the action succeeded and failed for. `on_progress` is awaited with both counts after
+        every item.
+        """
+        items = iter(items)
+        counts = {"succeeded": 0, "failed": 0}
+
+        async def work():
+            # every worker pulls the next item, so at most `concurrency` actions are in flight
+            for item in items:
+                error = await self.attempt(item, action)
+
+                if error is None:
+                    counts["succeeded"] += 1
+                else:
+                    counts["failed"] += 1
+                    if on_failure is not None:
+                        await on_failure(item, error)
+
+                if on_progress is not None:
+                    await on_progress(counts["succeeded"], counts["failed"])
+
+        await asyncio.gather(*(work() for _ in range(self.concurrency)))
+
+        return counts["succeeded"], counts["failed"]
+
+    async def attempt(self, item, action):
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire()
+
+            try:
+                await action(item)
+                return None
+            except discord.errors.HTTPException as e:
+                if (e.status != 429 and e.status < 500) or attempt == self.retries:
+                    return e
+
+                delay = self.retry_delay * 2 ** attempt
+                logging.warning(f"Discord error on bulk action, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logging.exception("Bulk action failed")
+                return e
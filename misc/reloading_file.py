@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+
+
+class ReloadingFile:
+    """
+    A value loaded from a file, which is loaded again once the file changed.
+
+    Changes are detected by modification time. A file which cannot be loaded keeps the previous value active until the
+    file changes again, so a half written or broken file never replaces a working one. Subclasses can watch something
+    other than a single modification time by overriding `version` and `read`.
+    """
+
+    def __init__(self, path: str, load=None, default=None, errors=(OSError, ValueError, KeyError, TypeError)):
+        self.path = path
+        self.load = load
+        self.current = default
+        self.errors = errors
+        self.loaded = None
+        self.lock = asyncio.Lock()
+
+    def version(self):
+        return os.stat(self.path).st_mtime_ns
+
+    def read(self, version):
+        return self.load(self.path)
+
+    def changed(self):
+        """Returns the version of the file when it differs from the loaded one, otherwise None."""
+        try:
+            version = self.version()
+        except OSError as e:
+            logging.error(f"Could not find {self.path}: {e}")
+            return None
+
+        return version if version != self.loaded else None
+
+    def store(self, version, read):
+        try:
+            self.current = read(version)
+            return True
+        except self.errors as e:
+            logging.error(f"Could not load {self.path}: {e}")
+            return False
+        finally:
+            self.loaded = version
+
+    def reload(self):
+        """Loads the file again when it changed. Returns whether a new value was swapped in."""
+        version = self.changed()
+
+        return version is not None and self.store(version, self.read)
+
+    def get(self):
+        self.reload()
+
+        return self.current
+
+    async def get_async(self):
+        """Like `get`, but a slow load runs in a thread and concurrent callers wait for it instead of loading again."""
+        if self.changed() is None:
+            return self.current
+
+        async with self.lock:
+            version = self.changed()
+
+            if version is not None:
+                # storing catches the load errors too, so it runs in the thread as a whole
+                await asyncio.to_thread(self.store, version, self.read)
+
+        return self.current
@@ -0,0 +1,67 @@
+import hashlib
+
+from schedule.calendar_index import IndexedEvent
+
+
+def content_hash(event: IndexedEvent):
+    content = "\x1f".join(map(str, (event.name, event.location, event.description, event.begin, event.end)))
+
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class FeedDiff:
+    """The events which were added, removed or changed by a sync of a feed, keyed by uid."""
+
+    def __init__(self):
+        self.added = {}
+        self.removed = {}
+        # uid -> (previous version, current version)
+        self.changed = {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self):
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed"
+
+    def merge(self, other):
+        """
+        Combines the diffs of two syncs of the same feed, or of two feeds of the same phase. An event removed by one
+        and added by the other only moved, between single events and recurring occurrences like a modified occurrence
+        which got reverted, or from one feed to another.
+        """
+        merged = FeedDiff()
+        merged.changed = {**self.changed, **other.changed}
+
+        for first, second in ((self, other), (other, self)):
+            for uid, event in first.added.items():
+                if uid in second.removed:
+                    merged.changed[uid] = (second.removed[uid], event)
+                else:
+                    merged.added[uid] = event
+
+            merged.removed.update((uid, event) for uid, event in first.removed.items() if uid not in second.added)
+
+        # a reverted modification leaves the event exactly as it was
+        merged.changed = {uid: (old, new) for uid, (old, new) in merged.changed.items()
+                          if content_hash(old) != content_hash(new)}
+
+        return merged
+
+    def discard_removed(self, uids):
+        """Forgets the removals of events which are still stored, in another feed of the phase."""
+        for uid in uids:
+            self.removed.pop(uid, None)
+
+    def notices(self, start: float, end: float):
+        """
+        Returns (previous, current) pairs for the lectures beginning between `start` and `end` which were moved or
+        cancelled, in which case current is None. Changes to only the description are not worth a notice.
+        """
+        notices = [(event, None) for event in self.removed.values() if start <= event.begin < end]
+
+        for old, new in self.changed.values():
+            if start <= old.begin < end and (old.begin, old.end, old.location) != (new.begin, new.end, new.location):
+                notices.append((old, new))
+
+        return sorted(notices, key=lambda notice: notice[0].begin)
@@ -0,0 +1,150 @@
+import heapq
+import threading
+from datetime import datetime, timedelta, timezone
+
+from dateutil import tz
+from dateutil.rrule import rrulestr
+from ics import Calendar
+
+from schedule.schedule_filter import ScheduleFilter
+
+# the grammar of the ics parser keeps its state globally, so worker threads must not parse at the same time. Only the
+# thread executor ever waits for it, every worker of the default process executor has a parser of its own.
+parse_lock = threading.Lock()
+
+
+class IndexedEvent:
+    __slots__ = ("uid", "name", "location", "description", "begin", "end")
+
+    def __init__(self, name: str, begin: float = 0, end: float = 0, location: str = None, description: str = None,
+                 uid: str = None):
+        self.uid = uid
+        self.name = name
+        self.location = location
+        self.description = description
+        self.begin = begin
+        self.end = end
+
+    @property
+    def duration(self):
+        return timedelta(seconds=self.end - self.begin)
+
+    @staticmethod
+    def from_ics(event):
+        return IndexedEvent(event.name, event.begin.timestamp(), event.end.timestamp(), event.location,
+                            event.description, event.uid)
+
+
+def extra_lines(event, name: str):
+    # the ics parser keeps properties it does not understand, like RRULE and EXDATE, as raw content lines
+    return [line for line in getattr(event, "extra", ()) if line.name == name]
+
+
+def parse_ics_datetimes(line, default_tz):
+    """Parses the (comma separated) date-times of an EXDATE or RECURRENCE-ID line."""
+    tzid = line.params.get("TZID")
+    line_tz = tz.gettz(tzid[0]) if tzid else default_tz
+
+    for value in line.value.split(","):
+        value = value.strip()
+
+        if value.endswith("Z"):
+            yield datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+        elif "T" in value:
+            yield datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=line_tz)
+        else:
+            yield datetime.strptime(value, "%Y%m%d").replace(tzinfo=line_tz)
+
+
+class RecurringEvent:
+    """A recurring event (RRULE) which is only expanded for the window that is asked for."""
+
+    __slots__ = ("template", "dtstart", "rules", "exdates")
+
+    def __init__(self, template: IndexedEvent, dtstart: datetime, rules, exdates=()):
+        self.template = template
+        self.dtstart = dtstart
+        self.rules = list(rules)
+        self.exdates = set(exdates)
+
+    @staticmethod
+    def from_ics(event, rules):
+        dtstart = event.begin.datetime
+        exdates = [exdate for line in extra_lines(event, "EXDATE") for exdate in parse_ics_datetimes(line, dtstart.tzinfo)]
+
+        return RecurringEvent(IndexedEvent.from_ics(event), dtstart, [f"RRULE:{line.value}" for line in rules], exdates)
+
+    def occurrences(self, start: float, end: float):
+        """Yields the occurrences which have not ended at `start` and begin before `end`, in time order."""
+        template = self.template
+        duration = template.end - template.begin
+
+        ruleset = rrulestr("\n".join(self.rules), dtstart=self.dtstart, forceset=True)
+        for exdate in self.exdates:
+            ruleset.exdate(exdate)
+
+        for occurrence in ruleset.xafter(datetime.fromtimestamp(start - duration, timezone.utc), inc=True):
+            begin = occurrence.timestamp()
+            if begin >= end:
+                return
+
+            yield IndexedEvent(template.name, begin, begin + duration, template.location, template.description,
+                               f"{template.uid}/{int(begin)}")
+
+
+class CalendarIndex:
+    """
+    Time-sorted view on a single calendar, with blacklisted events already left out.
+
+    Recurring events are kept as series and expanded lazily, so a semester long weekly lecture costs one entry instead
+    of one per week. Indexes are built off the event loop, so everything in here is plain data which can be handed back
+    from a worker thread or process.
+    """
+
+    def __init__(self, events, series=()):
+        self.events = sorted(events, key=lambda ev: ev.begin)
+        self.series = list(series)
+
+    def __len__(self):
+        return len(self.events)
+
+    @staticmethod
+    def from_ics(content: str, schedule_filter: ScheduleFilter = None):
+        with parse_lock:
+            calendar = Calendar(content)
+        events = calendar.events
+
+        if schedule_filter is not None:
+            events = [event for event in events if not schedule_filter.matches(event.name)]
+
+        singles = []
+        series = []
+        overrides = {}
+
+        for event in events:
+            rules = extra_lines(event, "RRULE")
+
+            if rules:
+                series.append(RecurringEvent.from_ics(event, rules))
+                continue
+
+            single = IndexedEvent.from_ics(event)
+
+            # a modified occurrence replaces the occurrence of its series it refers to, and takes over its uid so a
+            # moved occurrence shows up as a change instead of a removal
+            for line in extra_lines(event, "RECURRENCE-ID"):
+                recurrence_ids = list(parse_ics_datetimes(line, event.begin.datetime.tzinfo))
+
+                overrides.setdefault(event.uid, []).extend(recurrence_ids)
+                single.uid = f"{event.uid}/{int(recurrence_ids[0].timestamp())}"
+
+            singles.append(single)
+
+        for recurring in series:
+            recurring.exdates.update(overrides.get(recurring.template.uid, ()))
+
+        return CalendarIndex(singles, series)
+
+    def occurrences(self, start: float, end: float):
+        """Lazily merges the occurrences of all recurring events within the window into one time-ordered stream."""
+        return heapq.merge(*(recurring.occurrences(start, end) for recurring in self.series), key=lambda ev: ev.begin)
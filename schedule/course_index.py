@@ -0,0 +1,57 @@
+import bisect
+
+
+class CourseIndex:
+    """
+    Prefix index over the course names in the loaded calendars, for autocomplete.
+
+    Every word of a course name is a key into one sorted array, so "anat" finds "E0A12a Anatomie" as well as
+    "E0A12a" does. A lookup is a binary search followed by a scan over the matching keys. The index is immutable and
+    only rebuilt when a calendar changes, so completing a keystroke never touches the database.
+    """
+
+    def __init__(self, names=()):
+        self.names = sorted(set(names), key=str.lower)
+
+        keys = []
+        for position, name in enumerate(self.names):
+            words = name.lower().split()
+            # the full name is a key too, so a prefix spanning several words still matches
+            keys.extend((" ".join(words[i:]), position) for i in range(len(words)))
+
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+
+    def __len__(self):
+        return len(self.names)
+
+    def complete(self, prefix: str, limit: int = 25):
+        prefix = " ".join(prefix.lower().split())
+
+        if not prefix:
+            return self.names[:limit]
+
+        found = []
+        seen = set()
+
+        for i in range(bisect.bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+
+            if self.positions[i] not in seen:
+                seen.add(self.positions[i])
+                found.append(self.positions[i])
+
+        # names are listed alphabetically, not by the word that happened to match
+        return [self.names[position] for position in sorted(found)[:limit]]
+
+    def resolve(self, value: str):
+        """
+        Returns the full course name of an autocomplete value. Discord cuts choices to 100 characters, so a longer name
+        is found back by its prefix.
+        """
+        if value in self.names or len(value) < 100:
+            return value
+
+        return next((name for name in self.names if name.startswith(value)), value)
@@ -0,0 +1,207 @@
+import heapq
+
+import aiosqlite
+
+from schedule.calendar_diff import FeedDiff, content_hash
+from schedule.calendar_index import IndexedEvent
+
+
+async def merge_streams(streams):
+    """
+    Lazily merges time-ordered async event streams into one, like `heapq.merge`. Events whose uid was already yielded
+    by another stream are left out, as the same event is often published in more than one feed.
+    """
+    heap = []
+    for order, stream in enumerate(streams):
+        event = await anext(stream, None)
+        if event is not None:
+            heap.append((event.begin, order, event, stream))
+    heapq.heapify(heap)
+
+    seen = set()
+    while heap:
+        _, order, event, stream = heap[0]
+
+        following = await anext(stream, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following.begin, order, following, stream))
+
+        if event.uid in seen:
+            continue
+
+        seen.add(event.uid)
+        yield event
+
+
+class EventStore:
+    """
+    Parsed calendar events, persisted per feed in the `feed_events` table.
+
+    Lookups are range queries on the (feed, begin_at) index, so a restart can render the schedule without fetching or
+    parsing any ICS file, and memory use does not grow with the size of the calendars. A phase can have several feeds,
+    which are combined at query time by merging their sorted streams.
+    """
+
+    def __init__(self, con: aiosqlite.Connection, page_size: int = 32):
+        self.con = con
+        self.page_size = page_size
+        self.max_durations = {}
+
+    @staticmethod
+    def from_row(row):
+        return IndexedEvent(row["name"], row["begin_at"], row["end_at"], row["location"], row["description"],
+                            row["uid"])
+
+    @staticmethod
+    def unique_uids(events):
+        # some feeds repeat a uid for different events, those are told apart by their begin time
+        seen = set()
+
+        for event in events:
+            uid = event.uid if event.uid not in seen else f"{event.uid}@{int(event.begin)}"
+            seen.add(uid)
+
+            yield uid, event
+
+    async def sync_feed(self, feed: int, events, recurring: bool = False):
+        """
+        Makes the stored events of a feed match the given ones and returns what changed. Single events and expanded
+        occurrences of recurring events are synced separately, as the latter change every time the expansion window
+        moves.
+
+        Every event is compared with the previous snapshot through its content hash, so only added, removed or changed
+        events are written.
+        """
+        async with self.con.execute('SELECT * FROM feed_events WHERE `feed` = ?', (feed,)) as cursor:
+            existing = {row["uid"]: row for row in await cursor.fetchall()}
+
+        diff = FeedDiff()
+        rows = []
+        synced = set()
+
+        for uid, event in self.unique_uids(events):
+            digest = content_hash(event)
+            previous = existing.get(uid)
+            synced.add(uid)
+
+            if previous is not None and previous["content_hash"] == digest and previous["recurring"] == recurring:
+                continue
+
+            if previous is None:
+                diff.added[uid] = event
+            elif previous["content_hash"] is None:
+                # stored before events were hashed, there is nothing to compare with
+                pass
+            elif previous["content_hash"] != digest:
+                diff.changed[uid] = (self.from_row(previous), event)
+
+            rows.append((feed, uid, event.name, event.location, event.description, event.begin, event.end,
+                         int(recurring), digest))
+
+        for uid, row in existing.items():
+            if row["recurring"] == recurring and uid not in synced:
+                diff.removed[uid] = self.from_row(row)
+
+        await self.con.executemany(
+            'INSERT INTO feed_events (`feed`, `uid`, `name`, `location`, `description`, `begin_at`, `end_at`, '
+            '`recurring`, `content_hash`) values (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(`feed`, `uid`) DO UPDATE SET '
+            '`name` = excluded.name, `location` = excluded.location, `description` = excluded.description, '
+            '`begin_at` = excluded.begin_at, `end_at` = excluded.end_at, `recurring` = excluded.recurring, '
+            '`content_hash` = excluded.content_hash',
+            rows)
+        await self.con.executemany('DELETE FROM feed_events WHERE `feed` = ? AND `uid` = ?',
+                                   [(feed, uid) for uid in diff.removed])
+        await self.con.commit()
+
+        if rows or diff.removed:
+            self.max_durations.pop(feed, None)
+
+        return diff
+
+    async def has_recurring(self, feed: int):
+        async with self.con.execute('SELECT 1 FROM feed_events WHERE `feed` = ? AND `recurring` = 1 LIMIT 1',
+                                    (feed,)) as cursor:
+            return await cursor.fetchone() is not None
+
+    async def stored_uids(self, feeds, uids):
+        """Returns which of the given uids are stored in any of the given feeds."""
+        feeds, uids = list(feeds), list(uids)
+        if not feeds or not uids:
+            return set()
+
+        async with self.con.execute(
+                f'SELECT DISTINCT `uid` FROM feed_events WHERE `feed` IN ({", ".join("?" * len(feeds))}) '
+                f'AND `uid` IN ({", ".join("?" * len(uids))})', (*feeds, *uids)) as cursor:
+            return {row["uid"] for row in await cursor.fetchall()}
+
+    async def clear_feed(self, feed: int):
+        await self.con.execute('DELETE FROM feed_events WHERE `feed` = ?', (feed,))
+        await self.con.commit()
+
+        self.max_durations.pop(feed, None)
+
+    async def max_duration(self, feed: int):
+        if feed not in self.max_durations:
+            async with self.con.execute('SELECT MAX(`end_at` - `begin_at`) FROM feed_events WHERE `feed` = ?',
+                                        (feed,)) as cursor:
+                result = await cursor.fetchone()
+
+            self.max_durations[feed] = result[0] or 0
+
+        return self.max_durations[feed]
+
+    async def stream_feed(self, feed: int, time: float):
+        """Yields the events of a feed which have not ended at the given time, by begin time, one page at a time."""
+
+        # no event lasts longer than the longest one, which bounds the range of possibly ongoing events
+        begin = time - await self.max_duration(feed)
+        last_id = -1
+
+        while True:
+            async with self.con.execute(
+                    'SELECT * FROM feed_events WHERE `feed` = ? AND `end_at` >= ? AND '
+                    '(`begin_at` > ? OR (`begin_at` = ? AND `id` > ?)) ORDER BY `begin_at`, `id` LIMIT ?',
+                    (feed, time, begin, begin, last_id, self.page_size)) as cursor:
+                rows = await cursor.fetchall()
+
+            for row in rows:
+                yield self.from_row(row)
+
+            if len(rows) < self.page_size:
+                return
+
+            begin, last_id = rows[-1]["begin_at"], rows[-1]["id"]
+
+    def stream(self, feeds, time: float):
+        """Yields the events of all given feeds which have not ended at the given time, by begin time."""
+        return merge_streams([self.stream_feed(feed, time) for feed in feeds])
+
+    async def first_unfinished(self, feeds, time: float):
+        """Returns the first event (by begin time) which has not ended at the given time."""
+        stream = self.stream(feeds, time)
+
+        try:
+            return await anext(stream, None)
+        finally:
+            await stream.aclose()
+
+    async def course_names(self):
+        async with self.con.execute('SELECT DISTINCT `name` FROM feed_events') as cursor:
+            return [row["name"] for row in await cursor.fetchall() if row["name"]]
+
+    async def course_lectures(self, name: str, time: float, limit: int = 5):
+        """Returns (phase, event) pairs of the lectures of a course which have not ended at the given time."""
+        async with self.con.execute(
+                'SELECT feed_events.*, calendar_feeds.phase FROM feed_events JOIN calendar_feeds ON '
+                'calendar_feeds.id = feed_events.feed WHERE feed_events.name = ? AND feed_events.end_at >= ? '
+                'ORDER BY feed_events.begin_at LIMIT ?', (name, time, limit * 2)) as cursor:
+            rows = await cursor.fetchall()
+
+        lectures = {}
+        for row in rows:
+            # a lecture published in several feeds of a phase is listed once
+            lectures.setdefault((row["phase"], row["uid"]), (row["phase"], self.from_row(row)))
+
+        return list(lectures.values())[:limit]
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+
+
+class EmbedJob:
+
+    def __init__(self, subscription, embed, fingerprint: str):
+        self.subscription = subscription
+        self.embed = embed
+        self.fingerprint = fingerprint
+
+    @property
+    def channel_id(self):
+        return self.subscription.message.channel.id
+
+
+class ChannelBackoff:
+    """Exponential backoff per channel, so one broken or rate-limited channel does not slow down every pass."""
+
+    def __init__(self, base: float = 30, maximum: float = 3600):
+        self.base = base
+        self.maximum = maximum
+        self.failures = {}
+        self.retry_at = {}
+
+    def ready(self, channel_id: int, now: float):
+        return self.retry_at.get(channel_id, 0) <= now
+
+    def failed(self, channel_id: int, now: float):
+        failures = self.failures.get(channel_id, 0) + 1
+
+        self.failures[channel_id] = failures
+        self.retry_at[channel_id] = now + min(self.maximum, self.base * 2 ** (failures - 1))
+
+        return self.retry_at[channel_id]
+
+    def succeeded(self, channel_id: int):
+        self.failures.pop(channel_id, None)
+        self.retry_at.pop(channel_id, None)
+
+
+class FanoutStats:
+
+    def __init__(self, jobs: int):
+        self.jobs = jobs
+        self.edited = 0
+        self.skipped = 0
+        self.failed = 0
+        self.postponed = 0
+        self.peak_queue_depth = 0
+        self.duration = 0
+        # phase -> epoch at which its postponed messages can be retried
+        self.retries = {}
+
+    def __str__(self):
+        return (f"{self.jobs} messages in {self.duration:.2f}s: {self.edited} edited, {self.skipped} unchanged, "
+                f"{self.failed} failed, {self.postponed} backing off, peak queue depth {self.peak_queue_depth}")
+
+
+class EmbedFanout:
+    """
+    Bounded-concurrency delivery of rendered embeds.
+
+    Discord rate limits message edits per channel, so every channel is drained in order by a single worker while
+    different channels are edited concurrently, with at most `concurrency` edits in flight over all passes.
+    """
+
+    def __init__(self, deliver, concurrency: int = 8, backoff: ChannelBackoff = None):
+        self.deliver = deliver
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.backoff = backoff or ChannelBackoff()
+        self.channel_locks = {}
+        self.queue_depth = 0
+
+    async def run(self, jobs):
+        stats = FanoutStats(len(jobs))
+        started = time.perf_counter()
+
+        channels = {}
+        for job in jobs:
+            channels.setdefault(job.channel_id, []).append(job)
+
+        self.queue_depth += len(jobs)
+        stats.peak_queue_depth = self.queue_depth
+
+        await asyncio.gather(*(self.drain_channel(channel_id, channel_jobs, stats)
+                               for channel_id, channel_jobs in channels.items()))
+
+        stats.duration = time.perf_counter() - started
+        return stats
+
+    async def drain_channel(self, channel_id: int, jobs, stats: FanoutStats):
+        async with self.channel_locks.setdefault(channel_id, asyncio.Lock()):
+            for job in jobs:
+                stats.peak_queue_depth = max(stats.peak_queue_depth, self.queue_depth)
+
+                try:
+                    await self.deliver_job(channel_id, job, stats)
+                finally:
+                    self.queue_depth -= 1
+
+    async def deliver_job(self, channel_id: int, job: EmbedJob, stats: FanoutStats):
+        now = time.time()
+        phase = job.subscription.phase
+
+        if job.subscription.fingerprint == job.fingerprint:
+            stats.skipped += 1
+            return
+
+        if not self.backoff.ready(channel_id, now):
+            stats.postponed += 1
+            stats.retries[phase] = min(stats.retries.get(phase, float("inf")), self.backoff.retry_at[channel_id])
+            return
+
+        try:
+            async with self.semaphore:
+                edited = await self.deliver(job.subscription, job.embed, job.fingerprint)
+        except Exception as e:
+            retry_at = self.backoff.failed(channel_id, time.time())
+
+            stats.failed += 1
+            stats.retries[phase] = min(stats.retries.get(phase, float("inf")), retry_at)
+            logging.warning(f"Could not update schedule message {job.subscription.message.id} in channel "
+                            f"{channel_id}, retrying in {retry_at - time.time():.0f}s: {e}")
+            return
+
+        self.backoff.succeeded(channel_id)
+
+        if edited:
+            stats.edited += 1
+        else:
+            stats.skipped += 1
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+
+import aiohttp
+
+
+class CachedCalendar:
+
+    def __init__(self, url: str, body: str, etag: str = None, last_modified: str = None, fetched_at: float = 0):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.digest = hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+    def conditional_headers(self):
+        headers = {}
+
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops requests to a host after repeated failures, and lets a single request through once the cooldown passed."""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self, now: float):
+        return self.opened_at is None or now - self.opened_at >= self.cooldown
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now: float):
+        self.failures += 1
+
+        if self.failures >= self.threshold:
+            self.opened_at = now
+
+
+class IcsCache:
+    """
+    Per-URL cache for ICS feeds.
+
+    All requests go through one long-lived session and are revalidated with ETag/If-Modified-Since, so an unchanged
+    calendar costs a 304 instead of a full download. The last good payload is kept on disk to survive restarts.
+
+    Every request has a strict timeout and is retried with jittered backoff. A host which keeps failing trips its
+    circuit breaker, after which requests fail immediately until the cooldown has passed.
+    """
+
+    def __init__(self, cache_dir: str = "cache/ics", ttl: int = 60, timeout: float = 20, retries: int = 2,
+                 retry_delay: float = 2, breaker_threshold: int = 3, breaker_cooldown: float = 600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.session = None
+        self.entries = {}
+        self.locks = {}
+        self.breakers = {}
+
+    async def open(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def fetch(self, url: str) -> str:
+        entry = await self.fetch_entry(url)
+        return entry.body
+
+    async def fetch_entry(self, url: str) -> CachedCalendar:
+        lock = self.locks.setdefault(url, asyncio.Lock())
+
+        # concurrent callers for the same url wait for the first request and reuse its result
+        async with lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                entry = self.load_entry(url)
+
+            if entry is not None and time.time() - entry.fetched_at < self.ttl:
+                return entry
+
+            breaker = self.breakers.setdefault(url, CircuitBreaker(self.breaker_threshold, self.breaker_cooldown))
+            if not breaker.allow(time.time()):
+                raise CircuitOpenError(f"Not fetching {url}, it failed {breaker.failures} times in a row")
+
+            for attempt in range(self.retries + 1):
+                try:
+                    entry = await self.request(url, entry)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.retries:
+                        breaker.record_failure(time.time())
+                        raise
+
+                    delay = self.retry_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+                    logging.warning(f"Fetching {url} failed ({e!r}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return entry
+
+    async def request(self, url: str, entry: CachedCalendar = None):
+        await self.open()
+
+        headers = entry.conditional_headers() if entry else {}
+        async with self.session.get(url, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                entry.fetched_at = time.time()
+                self.entries[url] = entry
+                return entry
+
+            response.raise_for_status()
+            content = await response.read()
+
+            entry = CachedCalendar(url, content.decode('utf-8'), response.headers.get("ETag"),
+                                   response.headers.get("Last-Modified"), time.time())
+
+        self.entries[url] = entry
+        self.store_entry(entry)
+
+        return entry
+
+    def entry_path(self, url: str):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.ics"), os.path.join(self.cache_dir, f"{name}.json")
+
+    def load_entry(self, url: str):
+        body_path, meta_path = self.entry_path(url)
+
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            with open(body_path, encoding='utf-8') as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None
+
+        # a payload from disk is always revalidated before it is trusted
+        entry = CachedCalendar(url, body, meta.get("etag"), meta.get("last_modified"))
+        self.entries[url] = entry
+
+        return entry
+
+    def store_entry(self, entry: CachedCalendar):
+        body_path, meta_path = self.entry_path(entry.url)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # write to a temporary file first so a crash never leaves a half written calendar behind
+            with open(body_path + ".tmp", "w", encoding='utf-8') as file:
+                file.write(entry.body)
+            os.replace(body_path + ".tmp", body_path)
+
+            with open(meta_path + ".tmp", "w") as file:
+                json.dump({"url": entry.url, "etag": entry.etag, "last_modified": entry.last_modified}, file)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            logging.warning(f"Could not store ICS cache for {entry.url}: {e}")
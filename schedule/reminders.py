@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+import time
+
+import aiosqlite
+import discord
+from discord import app_commands
+from discord.ext import tasks, commands
+
+from misc.rate_limiter import RateLimiter
+from schedule.schedule import CourseEvent
+from schedule.timers import TimerHeap
+
+
+class ReminderModule(commands.Cog):
+    """
+    DM reminders a number of minutes before every lecture of a phase.
+
+    Subscribers are grouped by (phase, minutes), so a single deadline in a timer heap covers everyone who wants to be
+    reminded of the same lecture at the same time, no matter how many subscribers there are.
+    """
+
+    def __init__(self, bot, con: aiosqlite.Connection):
+        self.__cog_name__ = "reminders"
+        self.bot = bot
+        self.tree = bot.tree
+        self.con = con
+        # (phase, minutes) -> user ids
+        self.subscribers = {}
+        # (user id, phase) -> minutes
+        self.subscriptions = {}
+        # (phase, minutes) -> lectures the next deadline of that group reminds of
+        self.pending = {}
+        # (phase, minutes) -> begin time of the last lecture reminded of, so a lecture is never reminded of twice
+        self.reminded = {}
+        self.timers = TimerHeap()
+        self.wakeup = asyncio.Event()
+        self.limiter = RateLimiter(float(os.getenv("REMINDER_DM_RATE", 5)))
+        self.deliveries = set()
+
+    async def cog_load(self) -> None:
+        await self.load_subscriptions()
+        self.run_reminders.start()
+
+    async def cog_unload(self) -> None:
+        self.run_reminders.cancel()
+
+        for delivery in self.deliveries:
+            delivery.cancel()
+
+    @property
+    def schedule(self):
+        return self.bot.get_cog("scheduling")
+
+    @app_commands.command(name="herinnering", description="Herinnering per DM ontvangen voor elk hoorcollege van een fase")
+    async def remind(self, int: discord.Interaction, phase: int, minutes: app_commands.Range[int, 1, 1440] = 15):
+        await self.subscribe(int.user.id, phase, minutes)
+
+        await int.response.send_message(
+            f"Je krijgt vanaf nu {minutes} minuten voor elk hoorcollege van fase {phase} een herinnering", ephemeral=True)
+
+    @app_commands.command(name="geenherinnering", description="Geen herinneringen meer ontvangen voor een fase")
+    async def stop_reminding(self, int: discord.Interaction, phase: int):
+        if not await self.unsubscribe(int.user.id, phase):
+            await int.response.send_message(f"Je ontving geen herinneringen voor fase {phase}", ephemeral=True)
+            return
+
+        await int.response.send_message(f"Je ontvangt geen herinneringen meer voor fase {phase}", ephemeral=True)
+
+    async def load_subscriptions(self):
+        async with self.con.execute('SELECT * FROM lecture_reminders') as cursor:
+            results = await cursor.fetchall()
+
+        for result in results:
+            self.add_subscriber(result["user_id"], result["phase"], result["minutes"])
+
+    def add_subscriber(self, user_id: int, phase: int, minutes: int):
+        self.subscriptions[(user_id, phase)] = minutes
+        self.subscribers.setdefault((phase, minutes), set()).add(user_id)
+
+    def remove_subscriber(self, user_id: int, phase: int):
+        minutes = self.subscriptions.pop((user_id, phase), None)
+        if minutes is None:
+            return False
+
+        key = (phase, minutes)
+        self.subscribers[key].discard(user_id)
+
+        if not self.subscribers[key]:
+            del self.subscribers[key]
+            self.pending.pop(key, None)
+            self.timers.cancel(key)
+
+        return True
+
+    async def subscribe(self, user_id: int, phase: int, minutes: int):
+        await self.con.execute(
+            'INSERT INTO lecture_reminders (`user_id`, `phase`, `minutes`) values (?, ?, ?) '
+            'ON CONFLICT(`user_id`, `phase`) DO UPDATE SET `minutes` = excluded.minutes',
+            (user_id, phase, minutes))
+        await self.con.commit()
+
+        self.remove_subscriber(user_id, phase)
+        self.add_subscriber(user_id, phase, minutes)
+
+        # a group which already existed has its deadline scheduled
+        if (phase, minutes) not in self.pending:
+            await self.try_schedule_group((phase, minutes))
+            self.wakeup.set()
+
+    async def unsubscribe(self, user_id: int, phase: int):
+        await self.con.execute('DELETE FROM lecture_reminders WHERE `user_id` = ? AND `phase` = ?', (user_id, phase))
+        await self.con.commit()
+
+        return self.remove_subscriber(user_id, phase)
+
+    async def schedule_group(self, key):
+        phase, minutes = key
+        lead = minutes * 60
+
+        # lectures which begin too soon to still be reminded of in time are skipped
+        after = max(time.time() + lead, self.reminded.get(key, 0))
+        lectures = await self.schedule.lectures_starting_after(phase, after)
+
+        if not lectures:
+            self.pending.pop(key, None)
+            self.timers.cancel(key)
+            return
+
+        self.pending[key] = lectures
+        self.timers.schedule(key, lectures[0].begin - lead)
+
+    async def try_schedule_group(self, key):
+        # a failing lookup only delays this group until the next refresh, it must not stop the reminder loop
+        try:
+            await self.schedule_group(key)
+        except Exception:
+            logging.exception(f"Could not schedule the reminders of phase {key[0]}, {key[1]} minutes before")
+
+    @commands.Cog.listener('on_schedule_refreshed')
+    async def on_schedule_refreshed(self, phase: int):
+        # lectures may have moved, every group of the phase looks up its next lecture again
+        for key in [key for key in self.subscribers if key[0] == phase]:
+            await self.try_schedule_group(key)
+
+        self.wakeup.set()
+
+    def build_reminder(self, lectures, minutes: int, limit: int = 10):
+        title = f"⏰  |  Hoorcollege binnen {minutes} {'minuut' if minutes == 1 else 'minuten'}"
+        # Discord allows at most 10 embeds per message, the last one lists the lectures which did not fit
+        shown = lectures if len(lectures) <= limit else lectures[:limit - 1]
+        embeds = []
+
+        for lecture in shown:
+            embed = self.schedule.build_embed(CourseEvent(lecture, CourseEvent.UPCOMING))
+            embed.title = title
+            embeds.append(embed)
+
+        remaining = lectures[len(shown):]
+        if remaining:
+            lines = [f"**{lecture.name}**" + (f"  |  {lecture.location}" if lecture.location else "")
+                     for lecture in remaining]
+            embeds.append(discord.Embed(title=f"{title}  |  en nog {len(remaining)}",
+                                        description="\n".join(lines)[:4096], color=embeds[-1].color))
+
+        return embeds
+
+    @tasks.loop()
+    async def run_reminders(self):
+        deadline = self.timers.next_deadline()
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        self.wakeup.clear()
+
+        due = self.timers.pop_due(time.time())
+        batch = []
+
+        # everyone due at this instant is delivered as one batch
+        for key in due:
+            lectures = self.pending.pop(key, None)
+            if not lectures:
+                continue
+
+            self.reminded[key] = lectures[0].begin
+            embeds = self.build_reminder(lectures, key[1])
+            batch.extend((user_id, key[0], lectures[0].begin, embeds) for user_id in self.subscribers.get(key, ()))
+
+        if batch:
+            # delivery is rate limited and can take a while, the scheduler does not wait for it
+            delivery = asyncio.create_task(self.deliver(batch))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+
+        for key in due:
+            if key in self.subscribers:
+                await self.try_schedule_group(key)
+
+    @run_reminders.before_loop
+    async def before_run_reminders(self):
+        await self.bot.wait_until_ready()
+
+        for key in list(self.subscribers):
+            await self.try_schedule_group(key)
+
+    async def deliver(self, batch):
+        sent = 0
+        started = time.perf_counter()
+
+        # groups in a batch can remind of lectures at different times, the soonest lectures go first
+        for user_id, phase, begin, embeds in sorted(batch, key=lambda reminder: reminder[2]):
+            # a reminder which can only arrive once the lecture started is useless
+            if time.time() >= begin:
+                continue
+
+            await self.limiter.acquire()
+
+            try:
+                user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await user.send(embeds=embeds)
+                sent += 1
+            except discord.errors.NotFound:
+                logging.warning(f"Removing reminders of unknown user {user_id}")
+                await self.unsubscribe(user_id, phase)
+            except discord.errors.Forbidden:
+                # the user does not accept DMs from the bot, retrying every lecture would only waste the rate limit
+                logging.warning(f"Removing reminders of user {user_id} for phase {phase}, their DMs are closed")
+                await self.unsubscribe(user_id, phase)
+            except discord.errors.HTTPException as e:
+                logging.warning(f"Could not send a lecture reminder to user {user_id}: {e}")
+
+        logging.info(f"Sent {sent} of {len(batch)} lecture reminders in {time.perf_counter() - started:.2f}s")
@@ -1,18 +1,30 @@
+import asyncio
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-import aiohttp
 import aiosqlite
 import discord
 import pytz
 from arrow import Arrow
 from discord import app_commands
 from discord.ext import tasks, commands
-from ics import Calendar, Event
 
 from dotenv import load_dotenv
 
+from schedule.calendar_diff import FeedDiff
+from schedule.calendar_index import CalendarIndex, IndexedEvent
+from schedule.course_index import CourseIndex
+from schedule.event_store import EventStore
+from schedule.fanout import EmbedFanout, EmbedJob
+from schedule.ics_cache import CircuitOpenError, IcsCache
+from schedule.schedule_filter import ScheduleFilterLoader
+from schedule.timers import TimerHeap
+
 load_dotenv()
 
 brussels_timezone = pytz.timezone('Europe/Brussels')
@@ -20,49 +32,146 @@ brussels_timezone = pytz.timezone('Europe/Brussels')
 
 
 class CourseEvent:
+    UNAVAILABLE = -2
     NO_EVENT = -1
     UPCOMING = 0
     CURRENT = 1
 
-    def __init__(self, event: Event, status: int):
+    def __init__(self, event: IndexedEvent, status: int, stale_since: float = None):
         self.event = event
         self.status = status
+        # set when the calendar could not be refreshed, holds the time of the last successful refresh
+        self.stale_since = stale_since
 
+    def next_transition(self):
+        """Returns the epoch at which the event shown for this phase changes, if it ever does."""
+        if self.status == CourseEvent.CURRENT:
+            # an event is still current at its exact end time
+            return self.event.end + 1
+        elif self.status == CourseEvent.UPCOMING:
+            return self.event.begin
 
-class ScheduleModule(commands.Cog):
-    blacklist = json.load(open('assets/schedule_filter.json'))["filter"]
+        return None
+
+
+class SubscribedMessage:
+
+    def __init__(self, message: discord.PartialMessage, phase: int, fingerprint: str = None):
+        self.message = message
+        self.phase = phase
+        self.fingerprint = fingerprint
+
+
+def create_parse_executor():
+    workers = int(os.getenv("ICS_PARSE_WORKERS", 2))
 
+    # threads have to take turns parsing (see parse_lock), so one large calendar holds up every other phase. Processes
+    # each have their own parser and keep large calendars from competing with the event loop for the GIL.
+    if os.getenv("ICS_PARSE_EXECUTOR", "process").lower() == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ics-parser")
+
+    # spawned instead of forked, the bot already runs threads of its own
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class ScheduleModule(commands.Cog):
     def __init__(self, bot, con: aiosqlite.Connection):
-        self.cur = None
         self.__cog_name__ = "scheduling"
         self.bot = bot
         self.tree = bot.tree
         self.con = con
+        self.ics_cache = IcsCache(os.getenv("ICS_CACHE_DIR", "cache/ics"), int(os.getenv("ICS_CACHE_TTL", 60)),
+                                  timeout=float(os.getenv("ICS_FETCH_TIMEOUT", 20)),
+                                  retries=int(os.getenv("ICS_FETCH_RETRIES", 2)),
+                                  breaker_cooldown=float(os.getenv("ICS_BREAKER_COOLDOWN", 600)))
+        self.stale_after = float(os.getenv("ICS_STALE_AFTER", 3 * int(os.getenv("ICS_REFRESH", 900))))
+        self.refresh_failures = set()
+        self.events = EventStore(con)
+        self.schedule_filter = ScheduleFilterLoader('assets/schedule_filter.json')
+        self.refresh_locks = {}
+        self.courses = CourseIndex()
+        # feed -> index holding its recurring events, expanded into stored events one window at a time
+        self.series = {}
+        self.recurrence_window = float(os.getenv("ICS_RECURRENCE_WINDOW_DAYS", 14)) * 86400
+        # only lectures within this horizon are worth a change notice
+        self.notice_horizon = float(os.getenv("ICS_CHANGE_NOTICE_DAYS", 14)) * 86400
+        self.parse_executor = None
+        self.parse_timeout = float(os.getenv("ICS_PARSE_TIMEOUT", 300))
+        self.refresh_tasks = set()
+        self.messages = {}
+        self.transitions = TimerHeap()
+        self.wakeup = asyncio.Event()
+        self.fanout = EmbedFanout(self.update_embed, int(os.getenv("SCHEDULE_FANOUT_CONCURRENCY", 8)))
 
     async def cog_load(self) -> None:
-        self.cur = await self.con.cursor()
+        self.parse_executor = create_parse_executor()
+        await self.ics_cache.open()
+        await self.load_messages()
+        await self.rebuild_courses()
         self.check_ical.start()
+        self.run_transitions.start()
 
     async def cog_unload(self) -> None:
         self.check_ical.cancel()
+        self.run_transitions.cancel()
 
-    async def get_file_content(self, url):
-        # thx https://github.com/Azure/azure-sdk-for-python/issues/13242#issuecomment-1239061801
-        session = aiohttp.ClientSession()
-        response = await session.get(url)
+        for task in self.refresh_tasks:
+            task.cancel()
 
-        content = await response.read()
+        await self.ics_cache.close()
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)
 
-        await session.close()
-        return content.decode('utf-8')
+    async def get_file_content(self, url):
+        return await self.ics_cache.fetch(url)
 
     @app_commands.command(name="provideics", description="ICS bestand linken aan een fase")
     @commands.has_permissions(administrator=True)
     async def provide_ics(self, int: discord.Interaction, link: str, phase: int):
         await int.response.defer()
         await self.register_calendar(link, phase)
+
+        self.refresh_in_background(phase)
         await int.followup.send("ICS has been registered succesfully", ephemeral=True)
 
+    @app_commands.command(name="removeics", description="ICS bestand ontkoppelen van een fase")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def remove_ics(self, int: discord.Interaction, link: str, phase: int):
+        await int.response.defer()
+
+        if not await self.unregister_calendar(link, phase):
+            await int.followup.send("This ICS is not registered for this phase", ephemeral=True)
+            return
+
+        self.request_update(phase)
+        await self.rebuild_courses()
+        await int.followup.send("ICS has been removed succesfully", ephemeral=True)
+
+    @app_commands.command(name="vak", description="Volgende hoorcolleges van een vak opzoeken")
+    async def course(self, int: discord.Interaction, course: str):
+        course = self.courses.resolve(course)
+        lectures = await self.events.course_lectures(course, time.time())
+
+        if not lectures:
+            await int.response.send_message(f"Geen komende hoorcolleges gevonden voor {course}", ephemeral=True)
+            return
+
+        embed = discord.Embed(title=f"📚  |  {course}", color=discord.Color.blue())
+
+        for phase, lecture in lectures:
+            begin = Arrow.fromtimestamp(lecture.begin, tzinfo=brussels_timezone)
+            end = Arrow.fromtimestamp(lecture.end, tzinfo=brussels_timezone)
+
+            embed.add_field(name=f"{begin.format('dddd D MMMM', 'nl')}  |  {begin.format('HH:mm')} - {end.format('HH:mm')}",
+                            value=f"{lecture.location}  |  Fase {phase}", inline=False)
+
+        await int.response.send_message(embed=embed, ephemeral=True)
+
+    @course.autocomplete("course")
+    async def course_autocomplete(self, int: discord.Interaction, current: str):
+        # Discord allows at most 25 choices of at most 100 characters, /vak resolves a cut name again
+        return [app_commands.Choice(name=name[:100], value=name[:100]) for name in self.courses.complete(current)]
+
     @app_commands.command(name="setschedulechannel", description="Kalenderkanaal instellen in huidig tekstkanaal.")
     async def set_schedule_channel(self, int: discord.Interaction, phase: int):
         embed = discord.Embed(
@@ -76,38 +185,93 @@ class ScheduleModule(commands.Cog):
 
         await int.response.send_message("Dit kanaal ontvangt vanaf nu uurrooster updates", ephemeral=True)
 
+    async def refresh_feed(self, feed):
+        # a feed is never parsed twice at the same time, other feeds do not wait for it
+        async with self.refresh_locks.setdefault(feed["id"], asyncio.Lock()):
+            entry = await self.ics_cache.fetch_entry(feed["link"])
+            schedule_filter = self.schedule_filter.current
+            diff = FeedDiff()
+
+            # the feed is only parsed again when the fetched content or the filter actually changed, or when its
+            # recurring events were not parsed since the bot started
+            digest = hashlib.sha1(f"{entry.digest}:{schedule_filter.digest}".encode('utf-8')).hexdigest()
+            changed = feed["digest"] != digest
+
+            if changed or (feed["id"] not in self.series and await self.events.has_recurring(feed["id"])):
+                loop = asyncio.get_running_loop()
+                # a parse which never finishes fails the refresh instead of holding the feed's lock forever
+                index = await asyncio.wait_for(loop.run_in_executor(self.parse_executor, CalendarIndex.from_ics,
+                                                                    entry.body, schedule_filter), self.parse_timeout)
+
+                diff = await self.events.sync_feed(feed["id"], index.events)
+                # only the series are kept around, single events live in the database
+                self.series[feed["id"]] = CalendarIndex((), index.series)
+            elif feed["id"] not in self.series:
+                self.series[feed["id"]] = CalendarIndex(())
+
+            # the expansion window moves with time, so occurrences are synced on every refresh
+            if changed or self.series[feed["id"]].series:
+                now = time.time()
+                occurrences = self.series[feed["id"]].occurrences(now - 86400, now + self.recurrence_window)
+                diff = diff.merge(await self.events.sync_feed(feed["id"], occurrences, recurring=True))
+
+            await self.store_refresh(feed["id"], digest)
+
+        if diff:
+            logging.info(f"Calendar {feed['link']} of phase {feed['phase']} synced: {diff}")
+
+        return changed, diff
+
     async def get_event_at(self, time: Arrow, phase: int):
-        calendar = await self.fetch_calendar(phase)
+        feeds = await self.fetch_feeds(phase)
 
-        if calendar is None:
-            return CourseEvent(Event(name=f"Geen ICS geregistreerd voor fase {str(phase)}"), CourseEvent.NO_EVENT)
+        if not feeds:
+            return CourseEvent(IndexedEvent(f"Geen ICS geregistreerd voor fase {str(phase)}"), CourseEvent.NO_EVENT)
 
-        file = await self.get_file_content(await self.fetch_calendar(phase))
+        timestamp = time.timestamp()
 
-        try:
-            cal = Calendar(file)
+        # renders always use the last stored snapshot, a failing feed only adds a warning to it
+        stale_since = None
+        for feed in feeds:
+            refreshed_at = feed["refreshed_at"]
+
+            if feed["id"] in self.refresh_failures and (refreshed_at is None or
+                                                        timestamp - refreshed_at > self.stale_after):
+                stale_since = min(stale_since if stale_since is not None else float("inf"), refreshed_at or 0)
+
+        event = await self.events.first_unfinished([feed["id"] for feed in feeds], timestamp)
+
+        if event is None:
+            # without any snapshot there is no way of telling whether there is a lecture or not
+            if stale_since == 0:
+                return CourseEvent(IndexedEvent("Het uurrooster kon niet opgehaald worden"), CourseEvent.UNAVAILABLE)
 
-            events = sorted(cal.events, key=lambda ev: ev.begin)
+            return CourseEvent(IndexedEvent("Geen hoorcollege"), CourseEvent.NO_EVENT, stale_since)
 
-            for event in events:
+        if event.begin <= timestamp:
+            return CourseEvent(event, CourseEvent.CURRENT, stale_since)
 
-                if event.name in self.blacklist:
-                    continue
+        return CourseEvent(event, CourseEvent.UPCOMING, stale_since)
 
-                event_begin = Arrow.fromdatetime(event.begin)
-                event_end = Arrow.fromdatetime(event.end)
+    async def lectures_starting_after(self, phase: int, time: float):
+        """Returns the lectures of a phase with the earliest begin time after the given time, usually just one."""
+        lectures = []
+        stream = self.events.stream([feed["id"] for feed in await self.fetch_feeds(phase)], time)
 
-                if event_begin <= time <= event_end:
-                    return CourseEvent(event, CourseEvent.CURRENT)
+        try:
+            async for event in stream:
+                if lectures and event.begin > lectures[0].begin:
+                    break
 
-                elif event_end > time:
-                    return CourseEvent(event, CourseEvent.UPCOMING)
-        except:
-            logging.warning("Something went wrong while parsing the calendar... trying again.")
+                # ongoing events come first in the stream
+                if event.begin > time:
+                    lectures.append(event)
+        finally:
+            await stream.aclose()
 
-        return CourseEvent(Event("Geen hoorcollege"), CourseEvent.NO_EVENT)
+        return lectures
 
-    async def update_embed(self, embed_message, course_event: CourseEvent):
+    def build_embed(self, course_event: CourseEvent):
         ongoing_event = course_event.event
 
         if course_event.status == CourseEvent.CURRENT:
@@ -116,6 +280,9 @@ class ScheduleModule(commands.Cog):
         elif course_event.status == CourseEvent.UPCOMING:
             title = "➡️  |  Toekomstig hoorcollege"
             color = discord.Color.green()
+        elif course_event.status == CourseEvent.UNAVAILABLE:
+            title = "⚠️  |  Uurrooster niet beschikbaar"
+            color = discord.Color.orange()
         else:
             title = "❌  |  Geen hoorcollege "
             color = discord.Color.red()
@@ -127,97 +294,300 @@ class ScheduleModule(commands.Cog):
 
         embed.add_field(name="Hoorcollege", value=f"{ongoing_event.name}")
 
-        if course_event.status != course_event.NO_EVENT:
+        if course_event.status >= CourseEvent.UPCOMING:
             duration_str = str(ongoing_event.duration)
             hours, minutes, _ = duration_str.split(":")
             formatted_duration = f"{hours}u{minutes}m"
 
-            discord_timestamp = int(ongoing_event.end.timestamp())
+            discord_timestamp = int(ongoing_event.end)
+            begin = Arrow.fromtimestamp(ongoing_event.begin, tzinfo=brussels_timezone)
+            end = Arrow.fromtimestamp(ongoing_event.end, tzinfo=brussels_timezone)
 
             embed.add_field(name="Locatie", value=f"{ongoing_event.location}", inline=False)
             embed.add_field(name="Tijd",
-                            value=f"{ongoing_event.begin.to(brussels_timezone).format('HH:mm', 'nl')} - {ongoing_event.end.to(brussels_timezone).format('HH:mm', 'nl')}  |  {ongoing_event.begin.format('D MMMM YYYY', 'nl')}",
+                            value=f"{begin.format('HH:mm', 'nl')} - {end.format('HH:mm', 'nl')}  |  {begin.format('D MMMM YYYY', 'nl')}",
                             inline=False)
             embed.add_field(name="Duur", value=f"{formatted_duration}", inline=False)
             embed.add_field(name="Beschrijving", value=f"{ongoing_event.description}", inline=False)
             embed.add_field(name="Resterende tijd", value=f"<t:{discord_timestamp}:R>", inline=False)
 
+        if course_event.stale_since is not None and course_event.status != CourseEvent.UNAVAILABLE:
+            last_refresh = f"<t:{int(course_event.stale_since)}:R>" if course_event.stale_since else "onbekend"
+            embed.add_field(name="⚠️ Verouderd uurrooster",
+                            value=f"Het uurrooster kon niet vernieuwd worden, laatst bijgewerkt: {last_refresh}.",
+                            inline=False)
+
+        return embed
+
+    @staticmethod
+    def build_change_embed(notices, limit: int = 10):
+        def format_time(event: IndexedEvent):
+            return Arrow.fromtimestamp(event.begin, tzinfo=brussels_timezone).format('dddd D MMMM HH:mm', 'nl')
+
+        lines = []
+        for old, new in notices[:limit]:
+            if new is None:
+                lines.append(f"❌ **{old.name}** van {format_time(old)} gaat niet door")
+            elif old.location != new.location and old.begin == new.begin:
+                lines.append(f"📍 **{old.name}** van {format_time(old)} verhuist naar {new.location}")
+            else:
+                lines.append(f"🔁 **{old.name}** verplaatst van {format_time(old)} naar {format_time(new)} "
+                             f"({new.location})")
+
+        if len(notices) > limit:
+            lines.append(f"… en nog {len(notices) - limit} andere wijzigingen")
+
+        return discord.Embed(
+            title="📅  |  Rooster gewijzigd",
+            description="\n".join(lines),
+            color=discord.Color.orange()
+        )
+
+    async def post_change_notice(self, phase: int, diff: FeedDiff):
+        now = time.time()
+        notices = diff.notices(now, now + self.notice_horizon)
+
+        if not notices:
+            return
+
+        embed = self.build_change_embed(notices)
+        channels = {subscription.message.channel.id: subscription.message.channel
+                    for subscription in self.subscriptions_for(phase)}
+
+        for channel in channels.values():
+            try:
+                await channel.send(embed=embed)
+            except discord.errors.HTTPException as e:
+                logging.warning(f"Could not post a schedule change notice in channel {channel.id}: {e}")
+
+    @staticmethod
+    def fingerprint(embed: discord.Embed):
+        return hashlib.sha1(json.dumps(embed.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()
+
+    async def update_embed(self, subscription: SubscribedMessage, embed: discord.Embed, fingerprint: str = None):
+        if fingerprint is None:
+            fingerprint = self.fingerprint(embed)
+
+        # the remaining time is a Discord timestamp which counts down client side, so an unchanged embed needs no edit
+        if subscription.fingerprint == fingerprint:
+            return False
+
+        message = subscription.message
+
         try:
-            await embed_message.edit(embed=embed)
+            await message.edit(embed=embed)
         except discord.errors.NotFound:
-            logging.warning("Message does not exist...")
-        except discord.errors.DiscordServerError as e:
-            logging.error(e)
+            # dead messages are only discovered here, the handles are never fetched ahead of time
+            logging.warning(f"Unregistering non existent message with ID: {message.id}")
+            await self.unregister_message(message.id)
+            return False
+
+        await self.store_fingerprint(subscription, fingerprint)
+        return True
+
+    def subscriptions_for(self, phase: int):
+        return [subscription for subscription in self.messages.values() if subscription.phase == phase]
+
+    async def render_phase(self, phase: int):
+        now = Arrow.now()
+
+        # the phase is resolved and rendered once, no matter how many messages are subscribed to it
+        course_event = await self.get_event_at(now, phase)
+        embed = self.build_embed(course_event)
+        fingerprint = self.fingerprint(embed)
+
+        transition = course_event.next_transition()
+        if transition is not None:
+            self.transitions.schedule(phase, transition)
+        else:
+            self.transitions.cancel(phase)
+
+        return [EmbedJob(subscription, embed, fingerprint) for subscription in self.subscriptions_for(phase)]
+
+    async def try_render_phase(self, phase: int):
+        try:
+            return await self.render_phase(phase)
+        except Exception:
+            logging.exception(f"Could not render the schedule of phase {phase}")
+            return []
+
+    async def update_phases(self, phases):
+        rendered = await asyncio.gather(*(self.try_render_phase(phase) for phase in phases))
+        jobs = [job for phase_jobs in rendered for job in phase_jobs]
+
+        if not jobs:
+            return None
 
-    @tasks.loop(seconds=int(os.getenv("ICS_REFRESH", 90)))
+        stats = await self.fanout.run(jobs)
+
+        # messages in channels which are backing off are retried, even if the phase has no transition before that
+        for phase, retry_at in stats.retries.items():
+            self.transitions.schedule_earliest(phase, retry_at)
+
+        if stats.edited or stats.failed:
+            logging.info(f"[{Arrow.now()}][Phases {', '.join(map(str, phases))}] Schedule update: {stats}")
+
+        return stats
+
+    def request_update(self, phase: int):
+        self.transitions.schedule(phase, 0)
+        self.wakeup.set()
+
+    @tasks.loop()
+    async def run_transitions(self):
+        deadline = self.transitions.next_deadline()
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+
+        # sleeps until the earliest lecture boundary of any phase, or until a phase explicitly asks for an update
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        self.wakeup.clear()
+
+        await self.update_phases(self.transitions.pop_due(time.time()))
+
+    @run_transitions.before_loop
+    async def before_run_transitions(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=int(os.getenv("ICS_REFRESH", 900)))
     async def check_ical(self):
-        for guild in self.bot.guilds:
+        # events hidden or revealed by a new filter are not changes to the schedule itself
+        notify = not self.schedule_filter.reload()
+        if not notify:
+            logging.info("Schedule filter changed, rebuilding all calendars")
+
+        # phases without a schedule message are refreshed too, reminders of their lectures rely on the stored events
+        phases = {subscription.phase for subscription in self.messages.values()} | set(await self.fetch_phases())
 
-            for embed_message in await self.fetch_messages(guild):
-                message = embed_message["message"]
-                phase = embed_message["phase"]
+        await asyncio.gather(*(self.refresh_phase(phase, notify) for phase in phases))
 
-                now = Arrow.now()
+    async def refresh_phase(self, phase: int, notify: bool = True):
+        feeds = await self.fetch_feeds(phase)
+        results = await asyncio.gather(*(self.try_refresh_feed(feed) for feed in feeds))
 
-                logging.info(f"[{now}][Phase {phase}][{guild.id}][{message.channel.id}][{message.id}] Updating embed")
+        if any(changed for changed, _ in results):
+            await self.rebuild_courses()
 
-                event_now = await self.get_event_at(now, phase)
-                await self.update_embed(message, event_now)
+        if notify:
+            # the schedule shows the feeds of a phase as one, so do the notices. An event which moved to another feed
+            # is a change, one which another feed still has is not cancelled.
+            diff = FeedDiff()
+            for _, feed_diff in results:
+                diff = diff.merge(feed_diff)
+
+            diff.discard_removed(await self.events.stored_uids([feed["id"] for feed in feeds], diff.removed))
+            await self.post_change_notice(phase, diff)
+
+        # also after a failure, so the embed can show that it is based on an outdated calendar
+        self.request_update(phase)
+        self.bot.dispatch("schedule_refreshed", phase)
+
+    def refresh_in_background(self, phase: int):
+        # the event loop only keeps weak references to tasks, so the cog holds on to them until they are done
+        task = asyncio.create_task(self.refresh_phase(phase))
+        self.refresh_tasks.add(task)
+        task.add_done_callback(self.refresh_tasks.discard)
+
+    async def try_refresh_feed(self, feed):
+        try:
+            result = await self.refresh_feed(feed)
+            self.refresh_failures.discard(feed["id"])
+
+            return result
+        except CircuitOpenError as e:
+            self.refresh_failures.add(feed["id"])
+            logging.warning(f"Could not refresh calendar {feed['link']} of phase {feed['phase']}: {e}")
+        except Exception:
+            self.refresh_failures.add(feed["id"])
+            logging.exception(f"Could not refresh calendar {feed['link']} of phase {feed['phase']}")
+
+        return False, FeedDiff()
+
+    async def rebuild_courses(self):
+        # the new index replaces the old one at once, autocomplete never sees a half built index
+        self.courses = CourseIndex(await self.events.course_names())
 
     @commands.Cog.listener('on_raw_message_delete')
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
-        if await self.is_subscribed_message(payload.message_id):
+        if self.is_subscribed_message(payload.message_id):
             await self.unregister_message(payload.message_id)
 
     async def register_calendar(self, link: str, phase: int):
-        await self.cur.execute('INSERT INTO calendars (`link`, `phase`) values (?, ?) ON CONFLICT(`phase`) DO UPDATE SET `link` = excluded.link',
+        await self.con.execute('INSERT INTO calendar_feeds (`link`, `phase`) values (?, ?) ON CONFLICT(`phase`, `link`) DO UPDATE SET `digest` = NULL, `refreshed_at` = NULL',
                                (link, phase))
         await self.con.commit()
 
-    async def fetch_calendar(self, phase: int):
-        await self.cur.execute('SELECT * FROM calendars WHERE `phase` = ?', (phase,))
-        result = await self.cur.fetchone()
+    async def unregister_calendar(self, link: str, phase: int):
+        async with self.con.execute('SELECT `id` FROM calendar_feeds WHERE `phase` = ? AND `link` = ?',
+                                    (phase, link)) as cursor:
+            feed = await cursor.fetchone()
+
+        if feed is None:
+            return False
+
+        await self.con.execute('DELETE FROM calendar_feeds WHERE `id` = ?', (feed["id"],))
+        await self.events.clear_feed(feed["id"])
+
+        self.series.pop(feed["id"], None)
+        self.refresh_failures.discard(feed["id"])
+
+        return True
 
-        return result["link"] if result else None
+    async def store_refresh(self, feed: int, digest: str):
+        await self.con.execute('UPDATE calendar_feeds SET `digest` = ?, `refreshed_at` = ? WHERE `id` = ?',
+                               (digest, time.time(), feed))
+        await self.con.commit()
+
+    async def fetch_feeds(self, phase: int):
+        # phases are refreshed and messages updated concurrently, so every query gets its own cursor instead of a
+        # shared one
+        async with self.con.execute('SELECT * FROM calendar_feeds WHERE `phase` = ? ORDER BY `id`', (phase,)) as cursor:
+            return await cursor.fetchall()
 
-    async def is_subscribed_message(self, message_id: int):
-        await self.cur.execute('SELECT count(*) FROM subscribed_messages WHERE `message_id` = ?',
-                               (message_id,))
-        result = await self.cur.fetchone()
+    async def fetch_phases(self):
+        async with self.con.execute('SELECT DISTINCT `phase` FROM calendar_feeds') as cursor:
+            return [row["phase"] for row in await cursor.fetchall()]
 
-        return result[0] > 0
+    def is_subscribed_message(self, message_id: int):
+        return message_id in self.messages
 
-    async def fetch_messages(self, guild: discord.Guild):
-        await self.cur.execute('SELECT * FROM subscribed_messages WHERE `guild_id` = ?', (guild.id,))
-        results = await self.cur.fetchall()
+    async def load_messages(self):
+        async with self.con.execute('SELECT * FROM subscribed_messages') as cursor:
+            results = await cursor.fetchall()
 
-        messages = []
         for result in results:
             guild = self.bot.get_guild(result["guild_id"])
-            channel = guild.get_channel(result["channel_id"])
+            channel = guild.get_channel(result["channel_id"]) if guild else None
 
             if not channel:
                 await self.unregister_message(result["message_id"])
                 logging.warning(f"Unregistering message in non-existent channel with ID: {result['channel_id']}")
                 continue
 
-            try:
-                message = await channel.get_partial_message(result["message_id"]).fetch()
-            except discord.errors.NotFound:
-                logging.warning(f"Unregistering non existent message with ID: {result['message_id']}")
-                await self.unregister_message(result["message_id"])
-                continue
-
-            messages.append({"message": message, "phase": result["phase"]})
-
-        return messages
+            message = channel.get_partial_message(result["message_id"])
+            self.messages[message.id] = SubscribedMessage(message, result["phase"], result["fingerprint"])
 
     async def register_message(self, phase: int, message: discord.Message):
-        await self.cur.execute(
+        await self.con.execute(
             'INSERT INTO subscribed_messages (`phase`, `channel_id`, `message_id`, `guild_id`) values (?, ?, ?, ?)',
             (phase, message.channel.id, message.id, message.guild.id))
         await self.con.commit()
 
+        self.messages[message.id] = SubscribedMessage(message.channel.get_partial_message(message.id), phase)
+        self.refresh_in_background(phase)
+
     async def unregister_message(self, message_id: int):
-        await self.cur.execute('DELETE FROM subscribed_messages WHERE message_id = ?', (message_id,))
+        self.messages.pop(message_id, None)
+
+        await self.con.execute('DELETE FROM subscribed_messages WHERE message_id = ?', (message_id,))
+        await self.con.commit()
+
+    async def store_fingerprint(self, subscription: SubscribedMessage, fingerprint: str):
+        subscription.fingerprint = fingerprint
+
+        await self.con.execute('UPDATE subscribed_messages SET `fingerprint` = ? WHERE `message_id` = ?',
+                               (fingerprint, subscription.message.id))
         await self.con.commit()
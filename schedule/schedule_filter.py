@@ -0,0 +1,51 @@
+import hashlib
+import json
+import re
+
+from misc.reloading_file import ReloadingFile
+
+
+class ScheduleFilter:
+    """
+    Compiled form of `assets/schedule_filter.json`.
+
+    Exact event names and course codes (the first word of an event name, e.g. `E0I66a`) are hashed lookups, all regex
+    rules are joined into a single pattern. The filter is immutable and picklable, so it can be shipped to the
+    calendar parser workers as is.
+    """
+
+    def __init__(self, names=(), codes=(), patterns=(), digest: str = ""):
+        self.names = frozenset(names)
+        self.codes = frozenset(codes)
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+        self.digest = digest
+
+    @staticmethod
+    def from_json(content: str):
+        rules = json.loads(content)
+
+        return ScheduleFilter(rules.get("filter", []), rules.get("codes", []), rules.get("patterns", []),
+                              hashlib.sha1(content.encode('utf-8')).hexdigest())
+
+    def matches(self, name: str):
+        if not name:
+            return False
+
+        if name in self.names or name.split(None, 1)[0] in self.codes:
+            return True
+
+        return self.pattern is not None and self.pattern.search(name) is not None
+
+
+class ScheduleFilterLoader(ReloadingFile):
+    """Keeps the current ScheduleFilter in sync with the file it was loaded from."""
+
+    def __init__(self, path: str = "assets/schedule_filter.json"):
+        super().__init__(path, ScheduleFilterLoader.read_filter, ScheduleFilter(), (OSError, ValueError, re.error))
+
+        self.reload()
+
+    @staticmethod
+    def read_filter(path: str):
+        with open(path, encoding='utf-8') as file:
+            return ScheduleFilter.from_json(file.read())
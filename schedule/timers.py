@@ -0,0 +1,54 @@
+import heapq
+
+
+class TimerHeap:
+    """
+    Min-heap of deadlines keyed by phase (or any other hashable key).
+
+    Every key has at most one live deadline. Rescheduling or cancelling a key leaves its old heap entry behind, which is
+    discarded lazily once it reaches the top of the heap.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.deadlines = {}
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, when: float):
+        if self.deadlines.get(key) == when:
+            return
+
+        self.deadlines[key] = when
+        heapq.heappush(self.heap, (when, key))
+
+    def schedule_earliest(self, key, when: float):
+        """Schedules the key, unless it is already due earlier."""
+        if key not in self.deadlines or when < self.deadlines[key]:
+            self.schedule(key, when)
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+
+    def discard_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def next_deadline(self):
+        self.discard_stale()
+
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: float):
+        due = []
+
+        self.discard_stale()
+        while self.heap and self.heap[0][0] <= now:
+            when, key = heapq.heappop(self.heap)
+            del self.deadlines[key]
+            due.append(key)
+
+            self.discard_stale()
+
+        return due
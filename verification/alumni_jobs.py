@@ -0,0 +1,110 @@
+import csv
+import io
+import time
+
+import aiosqlite
+
+
+class AlumniJobs:
+    """
+    Durable alumni runs, stored in the `alumni_jobs` and `alumni_job_entries` tables.
+
+    A scan stores one entry per verified student which is no longer in the memberships. Granting the alumni role
+    checkpoints every entry, so an interrupted run continues with the entries which are still pending.
+    """
+
+    SCANNING = "scanning"
+    REPORTED = "reported"
+    GRANTING = "granting"
+    DONE = "done"
+    SUPERSEDED = "superseded"
+
+    LEFT = "left"
+    GUEST = "guest"
+    CHANGED = "changed"
+    ALUMNUS = "alumnus"
+
+    PENDING = "pending"
+    GRANTED = "granted"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    def __init__(self, con: aiosqlite.Connection):
+        self.con = con
+
+    async def create(self, guild_id: int, channel_id: int):
+        now = time.time()
+
+        async with self.con.execute(
+                'INSERT INTO alumni_jobs (`guild_id`, `channel_id`, `status`, `created_at`, `updated_at`) '
+                'values (?, ?, ?, ?, ?)', (guild_id, channel_id, AlumniJobs.SCANNING, now, now)) as cursor:
+            job_id = cursor.lastrowid
+        await self.con.commit()
+
+        return job_id
+
+    async def add_entries(self, job_id: int, entries):
+        """Stores (user id, email, outcome, new email) entries. Only alumni are left pending for the role grant."""
+        await self.con.executemany(
+            'INSERT OR IGNORE INTO alumni_job_entries (`job_id`, `user_id`, `email`, `outcome`, `new_email`, `state`) '
+            'values (?, ?, ?, ?, ?, ?)',
+            [(job_id, user_id, email, outcome, new_email,
+              AlumniJobs.PENDING if outcome == AlumniJobs.ALUMNUS else AlumniJobs.SKIPPED)
+             for user_id, email, outcome, new_email in entries])
+        await self.con.commit()
+
+    async def set_status(self, job_id: int, status: str):
+        await self.con.execute('UPDATE alumni_jobs SET `status` = ?, `updated_at` = ? WHERE `id` = ?',
+                               (status, time.time(), job_id))
+        await self.con.commit()
+
+    async def supersede(self, guild_id: int, job_id: int):
+        """Retires the reported jobs of a guild older than the given one, their scans are outdated."""
+        await self.con.execute('UPDATE alumni_jobs SET `status` = ?, `updated_at` = ? '
+                               'WHERE `guild_id` = ? AND `status` = ? AND `id` < ?',
+                               (AlumniJobs.SUPERSEDED, time.time(), guild_id, AlumniJobs.REPORTED, job_id))
+        await self.con.commit()
+
+    async def latest(self, guild_id: int, statuses):
+        async with self.con.execute(
+                f'SELECT * FROM alumni_jobs WHERE `guild_id` = ? AND `status` IN ({", ".join("?" * len(statuses))}) '
+                'ORDER BY `id` DESC LIMIT 1', (guild_id, *statuses)) as cursor:
+            return await cursor.fetchone()
+
+    async def with_status(self, status: str):
+        async with self.con.execute('SELECT * FROM alumni_jobs WHERE `status` = ?', (status,)) as cursor:
+            return await cursor.fetchall()
+
+    async def entries(self, job_id: int, state: str = None):
+        query = 'SELECT * FROM alumni_job_entries WHERE `job_id` = ?'
+        parameters = (job_id,)
+
+        if state is not None:
+            query += ' AND `state` = ?'
+            parameters += (state,)
+
+        async with self.con.execute(query + ' ORDER BY `id`', parameters) as cursor:
+            return await cursor.fetchall()
+
+    async def mark(self, entry_id: int, state: str, error: str = None):
+        await self.con.execute('UPDATE alumni_job_entries SET `state` = ?, `error` = ? WHERE `id` = ?',
+                               (state, error, entry_id))
+        await self.con.commit()
+
+    async def counts(self, job_id: int, column: str):
+        async with self.con.execute(
+                f'SELECT `{column}`, COUNT(*) AS `count` FROM alumni_job_entries WHERE `job_id` = ? '
+                f'GROUP BY `{column}`', (job_id,)) as cursor:
+            return {row[column]: row["count"] for row in await cursor.fetchall()}
+
+    @staticmethod
+    def report_csv(entries):
+        file = io.StringIO()
+        writer = csv.writer(file)
+
+        writer.writerow(["user_id", "email", "outcome", "new_email", "state", "error"])
+        for entry in entries:
+            writer.writerow([entry["user_id"], entry["email"], entry["outcome"], entry["new_email"] or "",
+                             entry["state"], entry["error"] or ""])
+
+        return file.getvalue().encode('utf-8')
@@ -0,0 +1,76 @@
+import re
+
+
+def name_matches(registered: str, candidate: str) -> bool:
+    if not registered or not candidate:
+        return False
+    r = registered.lower()
+    c = candidate.lower()
+    return r in c or c in r
+
+
+def normalize_localpart(email: str) -> str:
+    localpart = email.split("@")[0].lower()
+    return re.sub(r"\d+", "", localpart)
+
+
+def clean_localpart(email: str) -> str:
+    return email.split("@")[0].replace(".", " ").replace("_", " ").replace("-", " ").lower()
+
+
+class AlumniMatcher:
+    """
+    Matches verified students against the current memberships, to tell alumni apart from students whose address
+    changed.
+
+    The memberships are indexed once by exact address, by digit-stripped localpart and by the words of their localpart,
+    so every verified student is matched with a few dictionary lookups instead of a scan over all memberships.
+    """
+
+    def __init__(self, students):
+        self.students = list(students)
+        self.by_email = {}
+        self.by_localpart = {}
+        self.by_token = {}
+
+        for position, student in enumerate(self.students):
+            email = student.get_email()
+
+            # the first membership wins, like the scan this replaces
+            self.by_email.setdefault(email.lower(), position)
+            self.by_localpart.setdefault(normalize_localpart(email), position)
+
+            # digits are left out of the words, like they are when comparing localparts
+            for token in set(re.sub(r"\d+", "", clean_localpart(email)).split()):
+                self.by_token.setdefault(token, []).append(position)
+
+    def find(self, email: str):
+        position = self.by_email.get(email.lower())
+
+        return self.students[position] if position is not None else None
+
+    def find_similar(self, email: str):
+        """Returns the first membership whose localpart holds both names of the address, or the same localpart."""
+        parts = email.split("@")[0].lower().split(".")
+        firstname = parts[0]
+        lastname = parts[1] if len(parts) > 1 else ""
+
+        matches = []
+
+        position = self.by_localpart.get(normalize_localpart(email))
+        if position is not None:
+            matches.append(position)
+
+        # a candidate has at least one of the names as a whole word, the other name is still matched as a substring
+        candidates = set()
+        for name in (firstname, lastname):
+            candidates.update(self.by_token.get(re.sub(r"\d+", "", name), ()))
+
+        for position in sorted(candidates):
+            clean = clean_localpart(self.students[position].get_email())
+
+            if name_matches(firstname, clean) and name_matches(lastname, clean):
+                matches.append(position)
+                break
+
+        return self.students[min(matches)] if matches else None
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+import aiosqlite
+
+from misc.reloading_file import ReloadingFile
+
+logger = logging.getLogger(__name__)
+
+
+class MailTemplate:
+    """The verification mail, read once and only read again when its file changes."""
+
+    PLACEHOLDER = "{{CODE}}"
+
+    def __init__(self, path: str = "assets/email.html"):
+        self.file = ReloadingFile(path, MailTemplate.read)
+
+    @staticmethod
+    def read(path: str):
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+
+    def render(self, code: int):
+        html = self.file.get()
+
+        if html is None:
+            raise OSError(f"Could not load mail template {self.file.path}")
+
+        return html.replace(self.PLACEHOLDER, str(code))
+
+
+class MailOutbox:
+    """
+    Queue of outgoing verification mails, delivered to the Mailgun HTTP API by a pool of workers.
+
+    Requesting a code only stores the mail in the `mail_outbox` table and queues it, so the event loop never waits for
+    Mailgun. Failed deliveries are retried with exponential backoff, and the status of every mail is kept in the table.
+    The API URL is configurable, so the outbox can be pointed at a local stand-in.
+    """
+
+    QUEUED = "queued"
+    RETRYING = "retrying"
+    SENT = "sent"
+    FAILED = "failed"
+
+    def __init__(self, con: aiosqlite.Connection, api_url: str, api_key: str, domain: str, sender: str,
+                 template: MailTemplate, workers: int = 4, retries: int = 4, retry_delay: float = 2,
+                 timeout: float = 20):
+        self.con = con
+        self.url = f"{api_url.rstrip('/')}/v3/{domain}/messages"
+        self.api_key = api_key
+        self.sender = sender
+        self.template = template
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.queue = asyncio.Queue()
+        self.session = None
+        self.tasks = []
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(auth=aiohttp.BasicAuth("api", self.api_key or ""),
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        await self.requeue()
+
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        if self.session is not None:
+            await self.session.close()
+
+    async def enqueue(self, email: str, code: int):
+        now = time.time()
+
+        async with self.con.execute(
+                'INSERT INTO mail_outbox (`email`, `code`, `status`, `attempts`, `created_at`, `updated_at`) '
+                'values (?, ?, ?, 0, ?, ?)', (email, code, MailOutbox.QUEUED, now, now)) as cursor:
+            mail_id = cursor.lastrowid
+        await self.con.commit()
+
+        self.queue.put_nowait((mail_id, email, code))
+
+        return mail_id
+
+    async def requeue(self, max_age: float = 3600):
+        # mails which were still waiting when the bot stopped, their codes expire after an hour anyway
+        async with self.con.execute('SELECT * FROM mail_outbox WHERE `status` IN (?, ?) AND `created_at` >= ?',
+                                    (MailOutbox.QUEUED, MailOutbox.RETRYING, time.time() - max_age)) as cursor:
+            for row in await cursor.fetchall():
+                self.queue.put_nowait((row["id"], row["email"], row["code"]))
+
+    async def status(self, mail_id: int):
+        async with self.con.execute('SELECT * FROM mail_outbox WHERE `id` = ?', (mail_id,)) as cursor:
+            return await cursor.fetchone()
+
+    async def update(self, mail_id: int, status: str, attempts: int, error: str = None, message_id: str = None):
+        await self.con.execute(
+            'UPDATE mail_outbox SET `status` = ?, `attempts` = ?, `last_error` = ?, `message_id` = ?, `updated_at` = ? '
+            'WHERE `id` = ?', (status, attempts, error, message_id, time.time(), mail_id))
+        await self.con.commit()
+
+    async def work(self):
+        while True:
+            mail_id, email, code = await self.queue.get()
+
+            try:
+                await self.deliver(mail_id, email, code)
+            except Exception:
+                logger.exception(f"Could not deliver mail {mail_id}")
+            finally:
+                self.queue.task_done()
+
+    async def deliver(self, mail_id: int, email: str, code: int):
+        try:
+            html = self.template.render(code)
+        except OSError as e:
+            # without a template there is nothing to send, retrying would not change that
+            await self.update(mail_id, MailOutbox.FAILED, 0, f"Template: {e}")
+            logger.error(f"Could not render mail {mail_id} to {email}: {e}")
+            return
+
+        data = {
+            "from": self.sender,
+            "to": email,
+            "subject": "Verificatie GNK Discord",
+            "html": html,
+            "o:tag": "verification"
+        }
+
+        for attempt in range(1, self.retries + 2):
+            retry_after = None
+
+            try:
+                async with self.session.post(self.url, data=data) as response:
+                    if response.status < 300:
+                        result = await response.json(content_type=None)
+                        await self.update(mail_id, MailOutbox.SENT, attempt, message_id=result.get("id"))
+                        return
+
+                    error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    # other client errors, like an invalid address or API key, fail the same way every time
+                    retryable = response.status == 429 or response.status >= 500
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+                retryable = True
+
+            if not retryable or attempt > self.retries:
+                await self.update(mail_id, MailOutbox.FAILED, attempt, error)
+                logger.error(f"Giving up on mail {mail_id} to {email} after {attempt} attempts: {error}")
+                return
+
+            await self.update(mail_id, MailOutbox.RETRYING, attempt, error)
+
+            delay = self.retry_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+
+            logger.warning(f"Could not deliver mail {mail_id}, retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,50 @@
+import json
+import logging
+from typing import NamedTuple
+
+
+class Membership(NamedTuple):
+    email: str
+    given_name: str
+    family_name: str
+
+
+class MembershipIndex:
+    """The entries of memberships.json, keyed by lowercased e-mail address."""
+
+    def __init__(self, memberships: dict = None):
+        self.memberships = memberships or {}
+
+    def __len__(self):
+        return len(self.memberships)
+
+    def __iter__(self):
+        return iter(self.memberships.values())
+
+    def get(self, email: str):
+        return self.memberships.get(email.strip().lower())
+
+    @staticmethod
+    def from_file(path: str):
+        with open(path, encoding='utf-8') as file:
+            results = json.load(file)["results"]
+
+        memberships = {}
+        skipped = 0
+
+        for result in results:
+            user = result["user"]
+
+            try:
+                membership = Membership(user["emailAddress"], user["givenName"], user["familyName"])
+            except KeyError:
+                skipped += 1
+                continue
+
+            # the first entry of an address wins, like the linear scan this replaces
+            memberships.setdefault(membership.email.lower(), membership)
+
+        if skipped:
+            logging.warning(f"Skipped {skipped} incomplete entries in {path}")
+
+        return MembershipIndex(memberships)
@@ -0,0 +1,61 @@
+import logging
+import os
+import struct
+
+from misc.reloading_file import ReloadingFile
+from verification.membership_index import MembershipIndex
+from verification.membership_snapshot import MembershipSnapshot
+
+
+class MembershipLoader(ReloadingFile):
+    """
+    Keeps the current membership lookup in sync with the files it was loaded from, rebuilding it when they change.
+
+    A compiled snapshot which is at least as recent as memberships.json is memory-mapped instead of parsing the export.
+    """
+
+    def __init__(self, path: str = "assets/memberships.json", snapshot_path: str = "assets/memberships.snapshot"):
+        super().__init__(path, default=MembershipIndex(),
+                         errors=(OSError, ValueError, KeyError, TypeError, struct.error))
+        self.snapshot_path = snapshot_path
+
+    def version(self):
+        sources = []
+
+        for path in (self.snapshot_path, self.path):
+            try:
+                sources.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass
+
+        if not sources:
+            raise FileNotFoundError(f"there is no snapshot at {self.snapshot_path} either")
+
+        # the snapshot wins a tie, it is compiled from the export
+        return max(sources, key=lambda source: (source[0], source[1] == self.snapshot_path))
+
+    def read(self, version):
+        _, path = version
+
+        memberships = None
+
+        if path == self.snapshot_path:
+            try:
+                memberships = MembershipSnapshot(path)
+            except (OSError, ValueError, struct.error) as e:
+                # a broken or outdated snapshot falls back to the export it was compiled from
+                if not os.path.exists(self.path):
+                    raise
+
+                logging.error(f"Could not load membership snapshot {path}, parsing {self.path} instead: {e}")
+                path = self.path
+
+        if memberships is None:
+            # runs in a thread, a faculty wide export takes a while to parse
+            memberships = MembershipIndex.from_file(path)
+        logging.info(f"Loaded {len(memberships)} memberships from {path}")
+
+        return memberships
+
+    async def get(self):
+        return await self.get_async()
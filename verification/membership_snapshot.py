@@ -0,0 +1,132 @@
+"""
+Compact binary snapshot of memberships.json.
+
+The raw export holds many fields which are never read, and parsing it allocates the whole document. The snapshot only
+keeps the e-mail address and names of every membership:
+
+    header   magic, version and number of records
+    records  fixed size (hash, email, given name, family name) records, sorted by hash
+    strings  length prefixed UTF-8 strings the records point to, names are stored once
+
+The runtime side memory-maps the snapshot and binary searches the records, so neither loading nor a lookup puts the
+whole file on the Python heap. Compile a snapshot from the repository root with
+
+    python -m verification.membership_snapshot assets/memberships.json assets/memberships.snapshot
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+
+from verification.membership_index import Membership, MembershipIndex
+
+MAGIC = b"MEMBSNAP"
+VERSION = 1
+
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<QIII")
+LENGTH = struct.Struct("<H")
+
+
+def email_hash(email: str):
+    return int.from_bytes(hashlib.blake2b(email.strip().lower().encode('utf-8'), digest_size=8).digest(), "little")
+
+
+def compile_snapshot(index: MembershipIndex, path: str):
+    strings = bytearray()
+    offsets = {}
+
+    def intern(value: str):
+        if value not in offsets:
+            encoded = value.encode('utf-8')
+            offsets[value] = len(strings)
+            strings.extend(LENGTH.pack(len(encoded)) + encoded)
+
+        return offsets[value]
+
+    records = sorted((email_hash(membership.email), intern(membership.email), intern(membership.given_name),
+                      intern(membership.family_name)) for membership in index)
+
+    # written next to the old snapshot and swapped in at once, a running bot never maps a half written file
+    with open(f"{path}.tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(records)))
+
+        for record in records:
+            file.write(RECORD.pack(*record))
+
+        file.write(strings)
+
+    os.replace(f"{path}.tmp", path)
+
+    return len(records)
+
+
+class MembershipSnapshot:
+    """Read-only view on a compiled snapshot, with the same lookups as MembershipIndex."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} membership snapshot")
+
+        self.strings = HEADER.size + self.count * RECORD.size
+        if len(self.map) < self.strings:
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self.membership(position)
+
+    def record(self, position: int):
+        return RECORD.unpack_from(self.map, HEADER.size + position * RECORD.size)
+
+    def string(self, offset: int):
+        start = self.strings + offset
+        length, = LENGTH.unpack_from(self.map, start)
+
+        return self.map[start + LENGTH.size:start + LENGTH.size + length].decode('utf-8')
+
+    def membership(self, position: int):
+        _, email, given_name, family_name = self.record(position)
+
+        return Membership(self.string(email), self.string(given_name), self.string(family_name))
+
+    def get(self, email: str):
+        target = email_hash(email)
+        low, high = 0, self.count
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self.record(middle)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        # different addresses can share a hash, those are told apart by the address itself
+        email = email.strip().lower()
+        while low < self.count and self.record(low)[0] == target:
+            membership = self.membership(low)
+            if membership.email.lower() == email:
+                return membership
+
+            low += 1
+
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiles memberships.json into a compact snapshot")
+    parser.add_argument("source", nargs="?", default="assets/memberships.json")
+    parser.add_argument("snapshot", nargs="?", default="assets/memberships.snapshot")
+    args = parser.parse_args()
+
+    count = compile_snapshot(MembershipIndex.from_file(args.source), args.snapshot)
+    print(f"Compiled {count} memberships into {args.snapshot} ({os.path.getsize(args.snapshot)} bytes)")
@@ -0,0 +1,65 @@
+import json
+from types import MappingProxyType
+
+import discord
+
+from misc.reloading_file import ReloadingFile
+
+
+class RoleMapping:
+    """
+    The course roles of role_verification.json and the roles they are synced to, keyed by int role id.
+
+    The forward and reverse maps are built once and cannot be changed, a new file gives a new mapping.
+    """
+
+    def __init__(self, roles: dict = None):
+        self.forward = MappingProxyType({int(source): int(target) for source, target in (roles or {}).items()})
+
+        reverse = {}
+        for source, target in self.forward.items():
+            reverse.setdefault(target, set()).add(source)
+        self.reverse = MappingProxyType({target: frozenset(sources) for target, sources in reverse.items()})
+
+    def __len__(self):
+        return len(self.forward)
+
+    def targets(self, role_ids):
+        """The synced roles of the given course roles."""
+        return {self.forward[role_id] for role_id in role_ids if role_id in self.forward}
+
+    def orphans(self, role_ids):
+        """The synced roles among the given roles which none of the given course roles is synced to anymore."""
+        role_ids = set(role_ids)
+
+        return {role_id for role_id in role_ids if role_id in self.reverse and not self.reverse[role_id] & role_ids}
+
+    @staticmethod
+    def from_file(path: str):
+        with open(path, encoding='utf-8') as file:
+            return RoleMapping(json.load(file)["roles"])
+
+
+class RoleMappingLoader(ReloadingFile):
+    """Keeps the role mapping in sync with its file, so edits apply without restarting the bot."""
+
+    def __init__(self, path: str = "assets/role_verification.json"):
+        super().__init__(path, RoleMapping.from_file, RoleMapping())
+
+
+async def edit_roles(member: discord.Member, add=(), remove=(), reason: str = None):
+    """
+    Applies all role changes of a member in a single request, returns whether anything had to change.
+
+    Role ids which are unknown to the guild are left out. The role list is replaced as a whole, so it is computed from
+    the freshest cached state of the member instead of the one the caller was handed.
+    """
+    member = member.guild.get_member(member.id) or member
+    current = {role.id for role in member.roles if not role.is_default()}
+    wanted = (current | {role_id for role_id in add if member.guild.get_role(role_id) is not None}) - set(remove)
+
+    if wanted == current:
+        return False
+
+    await member.edit(roles=[discord.Object(role_id) for role_id in wanted], reason=reason)
+    return True
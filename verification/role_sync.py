@@ -0,0 +1,53 @@
+import csv
+import io
+
+import discord
+
+from verification.role_mapping import RoleMapping
+
+
+class RoleDiff:
+    __slots__ = ("member", "add", "remove")
+
+    def __init__(self, member: discord.Member, add, remove):
+        self.member = member
+        self.add = add
+        self.remove = remove
+
+
+def compute_role_diffs(members, verified: set, mapping: RoleMapping):
+    """
+    Computes which synced roles every verified member is missing or should no longer have, without any Discord or
+    database calls.
+    """
+    diffs = []
+
+    for member in members:
+        if member.id not in verified:
+            continue
+
+        role_ids = {role.id for role in member.roles}
+
+        add = mapping.targets(role_ids) - role_ids
+        # a synced role stays as long as the member has any of the roles it is synced from
+        remove = mapping.orphans(role_ids)
+
+        add = [role for role in map(member.guild.get_role, add) if role is not None]
+        remove = [role for role in member.roles if role.id in remove]
+
+        if add or remove:
+            diffs.append(RoleDiff(member, add, remove))
+
+    return diffs
+
+
+def diff_report_csv(diffs):
+    file = io.StringIO()
+    writer = csv.writer(file)
+
+    writer.writerow(["user_id", "name", "add", "remove"])
+    for diff in diffs:
+        writer.writerow([diff.member.id, diff.member.name, ", ".join(role.name for role in diff.add),
+                         ", ".join(role.name for role in diff.remove)])
+
+    return file.getvalue().encode('utf-8')
@@ -1,24 +1,27 @@
 import asyncio
 import arrow
-import json
+import io
 import logging
 import os
 import random
-import re
 import time
 import aiosqlite
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-from mailgun.client import Client
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 
-import db.connection_manager
 from verification import verificationmodal
 from verification import verificationuser
+from misc.bulk_executor import BulkExecutor
+from verification.alumni_jobs import AlumniJobs
+from verification.alumni_matcher import AlumniMatcher
+from verification.mail_outbox import MailOutbox, MailTemplate
+from verification.role_mapping import RoleMappingLoader, edit_roles
+from verification.role_sync import compute_role_diffs, diff_report_csv
 from verification.verification_logger import VerificationLogger
 
 
@@ -32,20 +35,24 @@ class VerificationView(discord.ui.View):
 
 class VerificationModule(commands.Cog):
     logger = None
-    replaceable_roles = None
+    # shared with the students, the mapping is only loaded again when its file changes
+    role_mapping = RoleMappingLoader("assets/role_verification.json")
 
     def __init__(self, bot: discord.ext.commands.Bot, con: aiosqlite.Connection):
         self.cur = None
-        # still here for BC
-        self.replaceable_roles = self.fetch_replaceable_roles()
-
-        VerificationModule.replaceable_roles = self.fetch_replaceable_roles()
         self.__cog_name__ = "verification"
         self.bot = bot
         self.tree = bot.tree
         self.con = con
-        self.messages_al = []
-        self.alumni_members = []
+        self.alumni_jobs = AlumniJobs(con)
+        self.running_alumni_jobs = set()
+        self.resume_task = None
+        self.bulk_executor = BulkExecutor(int(os.getenv("BULK_ACTION_CONCURRENCY", 4)),
+                                          float(os.getenv("BULK_ACTION_RATE", 2)))
+        self.outbox = MailOutbox(con, os.getenv("MAILGUN_API_URL", "https://api.eu.mailgun.net"),
+                                 os.getenv("MAILGUN_API"), os.getenv("MAILGUN_DOMAIN", "gnkdiscord.be"),
+                                 os.getenv("MESSAGES_FROM", "medicus@gnkdiscord.be"), MailTemplate('assets/email.html'),
+                                 workers=int(os.getenv("MAIL_WORKERS", 4)), retries=int(os.getenv("MAIL_RETRIES", 4)))
 
         channel = bot.get_channel(int(os.getenv("REPORTS_CHANNEL")))
         VerificationModule.logger = VerificationLogger(channel)
@@ -54,15 +61,18 @@ class VerificationModule(commands.Cog):
         self.cur = await self.con.cursor()
 
         await VerificationModule.logger.enable()
+        await self.outbox.open()
+        self.resume_task = asyncio.create_task(self.resume_alumni_jobs())
+        # builds the membership index and the verified users before the first events need them
+        await verificationuser.PartialStudent.memberships.get()
+        await verificationuser.PartialStudent.verified.load(self.con)
         self.check_codes.start()
 
     async def cog_unload(self) -> None:
         self.check_codes.cancel()
-
-    def fetch_replaceable_roles(self):
-        with open("assets/role_verification.json") as file:
-            roles = json.load(file)
-            return roles["roles"]
+        if self.resume_task is not None:
+            self.resume_task.cancel()
+        await self.outbox.close()
 
     async def get_synced_messages(self):
         await self.cur.execute(
@@ -115,36 +125,21 @@ class VerificationModule(commands.Cog):
             "DELETE FROM synced_verification_messages WHERE message_id = ?", (message_id,))
         await self.con.commit()
 
-    def send_mail(self, email, code):
-
-        auth = ("api", os.environ["MAILGUN_API"])
-        client: Client = Client(auth=auth, api_url="https://api.eu.mailgun.net/")
-        domain: str = "gnkdiscord.be"
-
-        with open('assets/email.html') as file:
-            html = file.read()
-
-        html = html.replace("{{CODE}}", str(code))
-
-        data = {
-            "from": os.getenv("MESSAGES_FROM", "medicus@gnkdiscord.be"),
-            "to": email,
-            "subject": "Verificatie GNK Discord",
-            "html": html,
-            "o:tag": "verification"
-        }
-        try:
-            req = client.messages.create(data=data, domain=domain)
-            print(req.status_code)
-            print(req.json())
-        except Exception as e:
-            print(f"Mailgun error: {e}")
+    async def send_mail(self, email, code):
+        # the mail is only queued here, the outbox workers deliver it without holding up the interaction
+        return await self.outbox.enqueue(email, code)
 
     @app_commands.command(name="verify", description="Handmatige verificatie van een gebruiker.")
     async def force_verify_user(self, int: discord.Interaction, member: discord.Member, email: str, voornaam: str = "",
                                 achternaam: str = ""):
         await int.response.defer()
 
+        # names which are not given are taken from the memberships, if the address is in there
+        membership = await verificationuser.PartialStudent.get_by_email(email)
+        if membership:
+            voornaam = voornaam or membership.name
+            achternaam = achternaam or membership.surname
+
         student = verificationuser.PartialStudent(email, voornaam, achternaam)
 
         if student:
@@ -178,11 +173,7 @@ class VerificationModule(commands.Cog):
                 f'De verificatiestatus van dit e-mailadres is ingetrokken, maar de Discord gebruiker geassocieerd met dit e-mailadres bestaat niet meer.')
             return
 
-        replaceable_roles = VerificationModule.replaceable_roles
-        roles_to_remove = [member.guild.get_role(replaceable_roles[str(role.id)]) for role in member.roles if
-                           str(role.id) in list(replaceable_roles.keys())]
-        await member.remove_roles(*roles_to_remove)
-        await member.add_roles(member.guild.get_role(int(os.getenv('UNVERIFIED_ROLE_ID'))))
+        await self.unverify_roles(member)
 
         await interaction.followup.send(f'De gebruiker met email {email} is succes gedeverifieerd.')
 
@@ -194,105 +185,179 @@ class VerificationModule(commands.Cog):
         if student:
             await student.unverify()
 
-            replaceable_roles = VerificationModule.replaceable_roles
-
-            roles_to_remove = [member.guild.get_role(replaceable_roles[str(role.id)]) for role in member.roles if
-                               str(role.id) in list(replaceable_roles.keys())]
-            await member.remove_roles(*roles_to_remove)
-
-            await member.add_roles(member.guild.get_role(int(os.getenv('UNVERIFIED_ROLE_ID'))))
+            await self.unverify_roles(member)
 
             await interaction.followup.send(f"{member.mention} is succesvol gedeverifieerd!")
         else:
             await interaction.followup.send(f"A sahbe, {member.mention} is niet eens geverifieerd. Rwina!")
 
-    def name_matches(self, registered: str, candidate: str) -> bool:
-        if not registered or not candidate:
-            return False
-        r = registered.lower()
-        c = candidate.lower()
-        return r in c or c in r
-
-    def normalize_localpart(self, email: str) -> str:
-        localpart = email.split("@")[0].lower()
-        return re.sub(r"\d+", "", localpart)
-
-    def find_student_by_name(self, student, current_partials):
-        for ps in current_partials:
-            localpart = ps.get_email().split("@")[0]
-            clean = localpart.replace(".", " ").replace("_", " ").replace("-", " ")
-
-            if (self.name_matches(student.get_firstname(), clean) and
-                    self.name_matches(student.get_lastname(), clean)):
-                return ps
+    async def unverify_roles(self, member: discord.Member):
+        synced = VerificationModule.role_mapping.get().targets(role.id for role in member.roles)
 
-            if self.normalize_localpart(student.get_email()) == self.normalize_localpart(ps.get_email()):
-                return ps
-        return None
+        await edit_roles(member, add={int(os.getenv('UNVERIFIED_ROLE_ID'))}, remove=synced, reason="Unverified")
 
     @app_commands.command(name="alumni", description="Checken wie niet meer in memberships.json staat.")
     async def alumni(self, interaction: discord.Interaction):
         await interaction.response.defer()
 
-        current_students = await verificationuser.PartialStudent.fetch_all()
-        for student in await verificationuser.Student.fetch_all():
-            found = await verificationuser.PartialStudent.get_by_email(student.email)
-
-            if not found:
-                member: Optional[discord.Member] = interaction.guild.get_member(student.get_discord_uid())
+        job_id = await self.alumni_jobs.create(interaction.guild.id, interaction.channel.id)
+        entries = []
 
-                if not member:
-                    self.messages_al.append(await interaction.channel.send(f"-# {student.email} has left the server, so ignoring ({student.get_discord_uid()})."))
-                    continue
+        # indexed once per run, every verified student is then matched with a few lookups
+        matcher = AlumniMatcher(await verificationuser.PartialStudent.fetch_all())
+        for student in await verificationuser.Student.fetch_all():
+            if matcher.find(student.email):
+                continue
 
-                if member and member.get_role(1157432995981037619):
-                    self.messages_al.append(await interaction.channel.send(f"-# {student.email} is a guest, so ignoring (<@{student.get_discord_uid()}>)"))
-                    continue
+            member: Optional[discord.Member] = interaction.guild.get_member(student.get_discord_uid())
+            similar = matcher.find_similar(student.email)
 
-                similar = self.find_student_by_name(student, current_students)
-                if similar:
-                    msg = (f"`{student.email}` changed to `{similar.email}` "
-                           f"(<@{student.get_discord_uid()}>)")
-                else:
-                    msg = (f"`{student.email}` is an alumnus "
-                           f"(<@{student.get_discord_uid()}>)")
+            if not member:
+                outcome = AlumniJobs.LEFT
+            elif member.get_role(1157432995981037619):
+                outcome = AlumniJobs.GUEST
+            elif similar:
+                outcome = AlumniJobs.CHANGED
+            else:
+                outcome = AlumniJobs.ALUMNUS
 
-                    self.alumni_members.append(member)
+            entries.append((student.get_discord_uid(), student.email, outcome, similar.email if similar else None))
 
-                self.messages_al.append(await interaction.channel.send(msg))
-                await asyncio.sleep(1)
+        await self.alumni_jobs.add_entries(job_id, entries)
+        await self.alumni_jobs.set_status(job_id, AlumniJobs.REPORTED)
+        # only the newest scan can be granted, an older report is never picked up again
+        await self.alumni_jobs.supersede(interaction.guild.id, job_id)
 
-        await interaction.followup.send("done")
+        await interaction.followup.send(embed=await self.alumni_report(job_id), file=await self.alumni_report_file(job_id))
 
     @app_commands.command()
     async def give_alumni_roles(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        for member in self.alumni_members:
-            await member.add_roles(interaction.guild.get_role(1421567656221479043))
-            embed = discord.Embed(
-                title="Alumni",
-                description=(
-                    "Volgens onze gegevens ben je geen bachelor- of masterstudent meer aan KU Leuven. "
-                    "Daarom heb je de rol **@alumnus** gekregen op de Geneeskunde KUL Discord-server.\n\n"
-                    "Denk je dat dit niet klopt? Neem dan gerust contact op met een van de bestuursleden."
-                ),
-                color=discord.Color.from_rgb(255, 0, 0)
-            )
 
-            self.messages_al.append(await interaction.channel.send(f"{member.mention} has received the alumni role"))
+        job = await self.alumni_jobs.latest(interaction.guild.id, (AlumniJobs.REPORTED, AlumniJobs.GRANTING))
+        if job is None:
+            await interaction.followup.send("Er is geen alumnirapport om af te werken, gebruik eerst /alumni.")
+            return
 
-            await member.send(embed=embed)
-            await asyncio.sleep(1)
+        if job["id"] in self.running_alumni_jobs:
+            await interaction.followup.send(f"Alumnirapport #{job['id']} wordt al afgewerkt.")
+            return
 
-        await interaction.channel.delete_messages(self.messages_al)
-        self.messages_al = []
-        await interaction.followup.send("done")
+        pending = len(await self.alumni_jobs.entries(job["id"], AlumniJobs.PENDING))
+        await interaction.followup.send(f"Alumnirapport #{job['id']} wordt afgewerkt, de voortgang volgt hieronder.")
+        # a channel message, the interaction token expires before a large report is done
+        progress = await interaction.channel.send(f"Alumnirollen toekennen: 0/{pending} leden...")
 
-    async def is_verified(self, user_id: int):
-        await self.cur.execute('SELECT COUNT(*) FROM verified_users WHERE `user_id` = ?', (user_id,))
-        result = await self.cur.fetchone()
+        update_progress = self.progress_updater(
+            progress, lambda done, failures: f"Alumnirollen toekennen: {done}/{pending} leden, {failures} mislukt...")
+
+        if not await self.grant_alumni_roles(job, update_progress):
+            await progress.edit(content=f"Alumnirapport #{job['id']} wordt al afgewerkt.")
+            return
+
+        await progress.edit(content=f"Alumnirapport #{job['id']} is afgewerkt.",
+                            embed=await self.alumni_report(job["id"]),
+                            attachments=[await self.alumni_report_file(job["id"])])
+
+    async def grant_alumni_roles(self, job, on_progress=None):
+        if job["id"] in self.running_alumni_jobs:
+            return False
+
+        self.running_alumni_jobs.add(job["id"])
+        try:
+            await self.run_alumni_job(job, on_progress)
+        finally:
+            self.running_alumni_jobs.discard(job["id"])
+
+        return True
+
+    async def run_alumni_job(self, job, on_progress=None):
+        await self.alumni_jobs.set_status(job["id"], AlumniJobs.GRANTING)
+
+        guild = self.bot.get_guild(job["guild_id"])
+        role = guild.get_role(1421567656221479043)
+        embed = discord.Embed(
+            title="Alumni",
+            description=(
+                "Volgens onze gegevens ben je geen bachelor- of masterstudent meer aan KU Leuven. "
+                "Daarom heb je de rol **@alumnus** gekregen op de Geneeskunde KUL Discord-server.\n\n"
+                "Denk je dat dit niet klopt? Neem dan gerust contact op met een van de bestuursleden."
+            ),
+            color=discord.Color.from_rgb(255, 0, 0)
+        )
+
+        async def grant(entry):
+            member = guild.get_member(entry["user_id"])
+            if member is None:
+                await self.alumni_jobs.mark(entry["id"], AlumniJobs.SKIPPED, "left the server")
+                return
+
+            if member.get_role(role.id) is None:
+                await member.add_roles(role, reason=f"Alumni job {job['id']}")
 
-        return result[0] > 0
+            # the role is what matters, a closed DM does not fail the entry
+            try:
+                await member.send(embed=embed)
+                error = None
+            except discord.errors.HTTPException as e:
+                error = f"DM failed: {e}"
+
+            await self.alumni_jobs.mark(entry["id"], AlumniJobs.GRANTED, error)
+
+        async def failed(entry, error):
+            await self.alumni_jobs.mark(entry["id"], AlumniJobs.FAILED, str(error))
+
+        # every entry is checkpointed, a restart continues with the ones which are still pending
+        granted, failures = await self.bulk_executor.run(await self.alumni_jobs.entries(job["id"], AlumniJobs.PENDING),
+                                                         grant, failed, on_progress)
+        await self.alumni_jobs.set_status(job["id"], AlumniJobs.DONE)
+
+        logger.info(f"Alumni job {job['id']} done: {granted} processed, {failures} failed")
+
+    async def resume_alumni_jobs(self):
+        await self.bot.wait_until_ready()
+
+        for job in await self.alumni_jobs.with_status(AlumniJobs.GRANTING):
+            logger.info(f"Resuming alumni job {job['id']}")
+
+            try:
+                if not await self.grant_alumni_roles(job):
+                    continue
+            except Exception:
+                logger.exception(f"Could not resume alumni job {job['id']}")
+                continue
+
+            channel = self.bot.get_channel(job["channel_id"])
+            if channel is not None:
+                await channel.send(embed=await self.alumni_report(job["id"]), file=await self.alumni_report_file(job["id"]))
+
+    async def alumni_report(self, job_id: int):
+        outcomes = await self.alumni_jobs.counts(job_id, "outcome")
+        states = await self.alumni_jobs.counts(job_id, "state")
+
+        embed = discord.Embed(
+            title=f"Alumnirapport #{job_id}",
+            description="De volledige lijst staat in de bijlage.",
+            color=discord.Color.blue()
+        )
+
+        embed.add_field(name="Alumni", value=str(outcomes.get(AlumniJobs.ALUMNUS, 0)))
+        embed.add_field(name="E-mailadres gewijzigd", value=str(outcomes.get(AlumniJobs.CHANGED, 0)))
+        embed.add_field(name="Gasten", value=str(outcomes.get(AlumniJobs.GUEST, 0)))
+        embed.add_field(name="Server verlaten", value=str(outcomes.get(AlumniJobs.LEFT, 0)))
+        embed.add_field(name="Rol nog toe te kennen", value=str(states.get(AlumniJobs.PENDING, 0)))
+        embed.add_field(name="Rol toegekend", value=str(states.get(AlumniJobs.GRANTED, 0)))
+        embed.add_field(name="Mislukt", value=str(states.get(AlumniJobs.FAILED, 0)))
+
+        return embed
+
+    async def alumni_report_file(self, job_id: int):
+        report = AlumniJobs.report_csv(await self.alumni_jobs.entries(job_id))
+
+        return discord.File(io.BytesIO(report), filename=f"alumni-{job_id}.csv")
+
+    async def is_verified(self, user_id: int):
+        return await verificationuser.Student.from_discord_uid(user_id) is not None
 
     @app_commands.command(description="Geeft gebruikersinfo via Discordnaam")
     async def whois(self, interaction: discord.Interaction, member: discord.Member):
@@ -323,15 +388,11 @@ class VerificationModule(commands.Cog):
     async def lookup(self, interaction: discord.Interaction, email: str):
         await interaction.response.defer()
 
-        cm = db.connection_manager.ConnectionManager
-        cur = cm.cur
-        conn = cm.con
-
-        await cur.execute('SELECT user_id FROM verified_users WHERE `email` = ?', (email,))
-        result = await cur.fetchone()
+        student = await verificationuser.Student.get_by_email(email)
 
-        if not result:
+        if not student:
             await interaction.followup.send("Deze persoon zit niet in de server of is niet geverifieerd.")
+            return
 
         embed = discord.Embed(
             title="Reverse Lookup",
@@ -340,7 +401,7 @@ class VerificationModule(commands.Cog):
         )
 
         embed.add_field(name="Discord",
-                        value=f"<@{result['user_id']}>",
+                        value=f"<@{student.get_discord_uid()}>",
                         inline=False)
 
         await interaction.followup.send(embed=embed)
@@ -419,76 +480,92 @@ class VerificationModule(commands.Cog):
         if channel is not None:
             await channel.send(f'Welkom **terug** {member.mention} in de geneeskunde Discord server!! 🎊.')
 
-    def get_sync_roles(self, roles_1, roles_2, member: discord.Member):
-        role_diff = set(roles_2) - set(roles_1)
-        subscribed_roles = [member.guild.get_role(self.replaceable_roles[str(role.id)]) for role in role_diff if
-                            str(role.id) in list(self.replaceable_roles.keys())]
-        subscribed_roles = [role for role in subscribed_roles if role is not None]
-
-        return subscribed_roles
-
     @app_commands.command(description="Synchroniseert vakrollen met NV rollen. Enkel toe te passen indien bot langdurig offline.")
-    async def sync_roles(self, interaction: discord.Interaction):
+    @app_commands.describe(dry_run="Enkel tonen wat er zou veranderen, zonder rollen aan te passen")
+    async def sync_roles(self, interaction: discord.Interaction, dry_run: bool = False):
         await interaction.response.defer()
 
-        for member in interaction.guild.members:
-            student = await verificationuser.Student.from_discord_uid(member.id)
+        # every diff is computed in memory, only members whose roles change cost a request
+        diffs = compute_role_diffs(interaction.guild.members, await verificationuser.Student.verified_ids(),
+                                   VerificationModule.role_mapping.get())
+        report = discord.File(io.BytesIO(diff_report_csv(diffs)), filename="sync-roles.csv")
 
-            if not student:
-                continue
+        if dry_run or not diffs:
+            await interaction.followup.send(
+                f"{len(diffs)} leden hebben rollen die niet gesynchroniseerd zijn"
+                f"{', er werd niets aangepast' if dry_run else ''}.", file=report)
+            return
+
+        await interaction.followup.send(f"Rollen synchroniseren bij {len(diffs)} leden, de voortgang volgt hieronder.")
+        # a channel message, the interaction token expires before a large guild is done
+        progress = await interaction.channel.send(f"Rollen synchroniseren: 0/{len(diffs)} leden...")
+
+        async def apply(diff):
+            await edit_roles(diff.member, [role.id for role in diff.add], [role.id for role in diff.remove],
+                             reason="Sync roles")
 
-            roles = member.roles
+        async def failed(diff, error):
+            logger.warning(f"Could not sync roles of {diff.member.id}: {error}")
 
-            roles_to_add = [member.guild.get_role(self.replaceable_roles[str(role.id)]) for role in roles if
-                            str(role.id) in list(self.replaceable_roles.keys()) and not member.get_role(
-                                self.replaceable_roles[str(role.id)])]
+        update_progress = self.progress_updater(
+            progress, lambda done, failures: f"Rollen synchroniseren: {done}/{len(diffs)} leden, {failures} mislukt...")
 
-            roles_to_remove = [role for role in roles if
-                               role.id in list(self.replaceable_roles.values()) and not member.get_role(
-                                   int({str(v): k for k, v in self.replaceable_roles.items()}[str(role.id)]))]
+        succeeded, failures = await self.bulk_executor.run(diffs, apply, failed, update_progress)
 
-            if roles_to_add: await interaction.channel.send(
-                f"Rollen toe te voegen bij {member.mention}" + ", ".join([role.name for role in roles_to_add]))
+        await progress.edit(content=f"Rollen gesynchroniseerd bij {succeeded}/{len(diffs)} leden, {failures} mislukt.",
+                            attachments=[report])
 
-            await member.add_roles(*roles_to_add)
+    @staticmethod
+    def progress_updater(message: discord.Message, describe, interval: float = 5):
+        """
+        Returns an `on_progress` callback for the bulk executor, which edits the message with the text `describe` makes
+        of the number of handled and failed items. The message is edited at most every few seconds, not once per item.
+        """
+        last_update = time.monotonic()
 
-            if roles_to_remove: await interaction.channel.send(
-                f"Rollen te verwijderen bij {member.mention}" + ", ".join([role.name for role in roles_to_remove]))
+        async def update(succeeded, failures):
+            nonlocal last_update
 
-            await member.remove_roles(*roles_to_remove)
+            if time.monotonic() - last_update < interval:
+                return
+            last_update = time.monotonic()
+
+            try:
+                await message.edit(content=describe(succeeded + failures, failures))
+            except discord.errors.HTTPException as e:
+                logger.warning(f"Could not update progress message {message.id}: {e}")
 
-        await interaction.followup.send("DONE")
+        return update
 
     @commands.Cog.listener('on_member_update')
     async def on_role_update(self, before: discord.Member, after: discord.Member):
-        student = await verificationuser.Student.from_discord_uid(after.id)
-        if student:
-            before_roles = set(before.roles)
-            after_roles = set(after.roles)
+        before_roles = {role.id for role in before.roles}
+        after_roles = {role.id for role in after.roles}
 
-            added_roles = after_roles - before_roles
-            removed_roles = before_roles - after_roles
+        # nickname, avatar and timeout changes end here
+        if before_roles == after_roles:
+            return
 
-            if added_roles:
-                sync_roles_to_add = [role for role in self.get_sync_roles(before.roles, after.roles, after)
-                                     if after.get_role(role.id) is None]
+        student = await verificationuser.Student.from_discord_uid(after.id)
+        if student:
+            mapping = VerificationModule.role_mapping.get()
 
-                roles = [role for role in self.get_sync_roles(before.roles, after.roles, after) if
-                         after.get_role(role.id) is None]
-                await after.add_roles(*roles)
+            sync_roles_to_add = mapping.targets(after_roles - before_roles) - after_roles
+            # a synced role stays as long as another course role is synced to it
+            sync_roles_to_remove = mapping.targets(before_roles - after_roles) & mapping.orphans(after_roles)
 
-                if sync_roles_to_add:
-                    await after.add_roles(*sync_roles_to_add)
+            # the per role endpoints, a full role list computed from this event could undo a change made right after it
+            guild = after.guild
+            sync_roles_to_add = {role_id for role_id in sync_roles_to_add if guild.get_role(role_id) is not None}
 
-            if removed_roles:
-                sync_roles_to_remove = [role for role in self.get_sync_roles(after.roles, before.roles, after)
-                                        if after.get_role(role.id)]
-                if sync_roles_to_remove:
-                    await after.remove_roles(*sync_roles_to_remove)
+            if sync_roles_to_add:
+                await after.add_roles(*map(discord.Object, sync_roles_to_add), reason="Synced course roles")
+            if sync_roles_to_remove:
+                await after.remove_roles(*map(discord.Object, sync_roles_to_remove), reason="Synced course roles")
 
-            print(f"Added roles: {sync_roles_to_add if added_roles else 'None'}")
-            print(f"Removed roles: {sync_roles_to_remove if removed_roles else 'None'}")
-            print("Role update processed successfully.")
+            if sync_roles_to_add or sync_roles_to_remove:
+                logger.info(f"Synced roles of {after.id}, added: {sync_roles_to_add or 'None'}, "
+                            f"removed: {sync_roles_to_remove or 'None'}")
 
     @app_commands.command(name="anonymous", description="Stel je vraag anoniem")
     async def ask_anonymous(self, interaction: discord.Interaction, question: str):
@@ -70,7 +70,7 @@ class CollectNameModal(ui.Modal, title="Geef je studentenmail"):
             code = await student.create_verification_code(interaction.user)
 
             if os.getenv("ENVIRONMENT").lower() != "dev":
-                self.verification_module.send_mail(student.email, code)
+                await self.verification_module.send_mail(student.email, code)
 
             view = ui.View(
                 timeout=None
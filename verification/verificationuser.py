@@ -1,5 +1,3 @@
-import json
-import logging
 import os
 import random
 
@@ -7,10 +5,18 @@ import discord
 
 import db.connection_manager
 import verification.verification
+from verification.membership_index import Membership
+from verification.membership_loader import MembershipLoader
+from verification.role_mapping import edit_roles
+from verification.verified_users import VerifiedUsers
 
 
 # represents a user which may or may not be verified
 class PartialStudent:
+    # shared by every lookup, memberships are only loaded again when their file changes
+    memberships = MembershipLoader("assets/memberships.json", "assets/memberships.snapshot")
+    # loaded once, verify and unverify keep it in sync with the table
+    verified = VerifiedUsers()
 
     def __init__(self, email: str, name: str = "", surname: str = ""):
         self.name = name
@@ -45,73 +51,52 @@ class PartialStudent:
 
     @staticmethod
     async def get_by_email(email: str):
-        with open("assets/memberships.json") as file:
-            memberships_raw = json.load(file)
-            result = memberships_raw["results"]
+        membership = (await PartialStudent.memberships.get()).get(email)
 
-            for user in result:
-                if "emailAddress" in user["user"] and email.lower() == user["user"]["emailAddress"]:
-                    user_details = user["user"]
-                    return PartialStudent(user_details["emailAddress"], user_details["givenName"],
-                                          user_details["familyName"])
-
-            return None
+        return PartialStudent.from_membership(membership) if membership else None
 
     @staticmethod
     async def fetch_all():
-        with open("assets/memberships.json") as file:
-            partial_students = []
-            memberships_raw = json.load(file)
-            result = memberships_raw["results"]
-            for user in result:
-                    user_details = user["user"]
-                    try:
-                        partial_students.append(PartialStudent(user_details["emailAddress"], user_details["givenName"],
-                                          user_details["familyName"]))
-                    except:
-                        logging.warning(user_details)
-
-            return partial_students
+        return [PartialStudent.from_membership(membership) for membership in await PartialStudent.memberships.get()]
 
-    async def verify(self, member: discord.Member):
-        role = member.guild.get_role(int(os.getenv('UNVERIFIED_ROLE_ID')))
+    @staticmethod
+    def from_membership(membership: Membership):
+        return PartialStudent(membership.email, membership.given_name, membership.family_name)
 
+    async def verify(self, member: discord.Member):
         cur, con = PartialStudent.db()
 
-        await member.remove_roles(role)
-        await self.replace_verification_roles(member)
-
-        if member.get_role(1196200228580237372):
-            await member.remove_roles(member.get_role(1196200228580237372))
+        # the unverified roles go and the synced roles come in the same request
+        await self.replace_verification_roles(member, remove={int(os.getenv('UNVERIFIED_ROLE_ID')), 1196200228580237372})
 
         await cur.execute('INSERT INTO verified_users (`user_id`, `email`) values(?, ?)',
                           (member.id, self.email))
         await cur.execute('DELETE FROM verification_codes WHERE `email` = ?',
                           (self.email,))
         await con.commit()
+        PartialStudent.verified.add(member.id, self.email)
 
         await verification.verification.VerificationModule.logger.user_verified(member, self)
 
-    async def replace_verification_roles(self, member: discord.Member):
-        roles = member.roles
-        replaceable_roles = verification.verification.VerificationModule.replaceable_roles
+    async def replace_verification_roles(self, member: discord.Member, remove=()):
+        mapping = verification.verification.VerificationModule.role_mapping.get()
 
-        for role in roles:
-            if str(role.id) in list(replaceable_roles.keys()):
-                real_role = member.guild.get_role(replaceable_roles[str(role.id)])
-                if member.get_role(real_role.id) is None:
-                    await member.add_roles(real_role)
+        await edit_roles(member, mapping.targets(role.id for role in member.roles), remove, reason="Verified")
 
     async def is_verified(self):
         return self.full() is not None
 
     async def full(self):
-        cur, con = PartialStudent.db()
+        uid = await PartialStudent.verified_uid(self.email)
 
-        await cur.execute('SELECT user_id FROM verified_users WHERE `email` = ?', (self.email,))
-        result = await cur.fetchone()
+        return Student(self.email, uid, self.name, self.surname) if uid is not None else None
 
-        return Student(self.email, result[0], self.name, self.surname) if result else None
+    @staticmethod
+    async def verified_uid(email: str):
+        cur, con = PartialStudent.db()
+        await PartialStudent.verified.ensure_loaded(con)
+
+        return PartialStudent.verified.uid_of(email)
 
     # helper function to facilitate db access
     @staticmethod
@@ -142,34 +127,39 @@ class Student(PartialStudent):
     @staticmethod
     async def from_discord_uid(uid: int):
         cur, con = Student.db()
+        await Student.verified.ensure_loaded(con)
 
-        await cur.execute('SELECT email FROM verified_users WHERE `user_id` = ?', (uid,))
-        result = await cur.fetchone()
+        email = Student.verified.email_of(uid)
 
-        return Student(result[0], uid) if result else None
+        return Student(email, uid) if email is not None else None
 
     @staticmethod
     async def get_by_email(email: str):
-        cur, con = Student.db()
+        uid = await Student.verified_uid(email)
 
-        await cur.execute('SELECT user_id FROM verified_users WHERE `email` = ?', (email,))
-        result = await cur.fetchone()
-
-        return Student(email, result[0]) if result else None
+        return Student(email, uid) if uid is not None else None
 
     async def unverify(self):
         cur, con = Student.db()
 
         await cur.execute('DELETE FROM verified_users WHERE user_id = ?', (self.discord_uid,))
         await con.commit()
+        Student.verified.remove(self.discord_uid)
 
     @staticmethod
     async def fetch_all():
         cur, con = Student.db()
-        await cur.execute('SELECT user_id, email FROM verified_users')
-        result = await cur.fetchall()
+        await Student.verified.ensure_loaded(con)
+
+        return [Student(email, user_id) for user_id, email in Student.verified.items()]
+
+    @staticmethod
+    async def verified_ids():
+        """The Discord ids of every verified user."""
+        cur, con = Student.db()
+        await Student.verified.ensure_loaded(con)
 
-        return [Student(email, user_id) for user_id, email in result]
+        return Student.verified.ids()
 
 
     @staticmethod
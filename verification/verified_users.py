@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+import aiosqlite
+
+
+class VerifiedUsers:
+    """
+    Write-through cache of the `verified_users` table, mapping Discord ids to e-mail addresses and back.
+
+    The table is read once, verifying and unverifying update the cache after their change is committed, so lookups on
+    the gateway event paths never wait for the database.
+    """
+
+    def __init__(self):
+        self.by_uid = {}
+        self.by_email = {}
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    async def load(self, con: aiosqlite.Connection):
+        async with self.lock:
+            async with con.execute('SELECT user_id, email FROM verified_users') as cursor:
+                rows = await cursor.fetchall()
+
+            self.by_uid = {int(user_id): email for user_id, email in rows}
+            self.by_email = {email: int(user_id) for user_id, email in rows}
+            self.loaded = True
+
+        logging.info(f"Loaded {len(self.by_uid)} verified users")
+
+    async def ensure_loaded(self, con: aiosqlite.Connection):
+        if not self.loaded:
+            await self.load(con)
+
+    def email_of(self, uid: int):
+        return self.by_uid.get(uid)
+
+    def uid_of(self, email: str):
+        return self.by_email.get(email)
+
+    def items(self):
+        return list(self.by_uid.items())
+
+    def ids(self):
+        return set(self.by_uid)
+
+    def add(self, uid: int, email: str):
+        self.by_uid[uid] = email
+        self.by_email[email] = uid
+
+    def remove(self, uid: int):
+        email = self.by_uid.pop(uid, None)
+        if email is not None:
+            self.by_email.pop(email, None)